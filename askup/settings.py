@@ -80,10 +80,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when an atomic block starts so read-modify-write
+            # sequences (e.g. point awards) are serialized instead of racing
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'askup',
+    },
+    # Values every process must agree on (community counters, snapshot and
+    # rule-index versions). Stored in the database so the web processes and
+    # the outbox worker see the same entries; the table is created by a
+    # users migration.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'askup_shared_cache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,3 +160,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/login/'
 LOGOUT_REDIRECT_URL = '/'
+
+# First day of the current term for the term leaderboard (ISO date, e.g. '2025-08-11').
+# When unset, terms start on January 1st and August 1st.
+LEADERBOARD_TERM_START = None
+
+# StudentActivity rows older than this many days are folded into daily rollups
+# by the compact_activity command.
+ACTIVITY_RETENTION_DAYS = 90
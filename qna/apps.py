@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QnaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qna'
+
+    def ready(self):
+        import qna.signals
@@ -0,0 +1,98 @@
+"""
+Cached community statistics counters.
+
+The totals shown on the landing page, the signup page poller and the admin
+dashboard are served from the shared cache, so every web process and the
+outbox worker read and adjust the same numbers. Signals nudge the cached
+values up or down as rows are created and deleted. Each counter is stored
+with the time it was last recounted and is recounted from the database once
+RECONCILE_SECONDS have passed (which also bounds drift from bulk operations
+that bypass signals) or when it is missing from the cache.
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_PREFIX = 'community_stats:'
+RECONCILE_SECONDS = 300
+
+COUNTERS = ('total_students', 'total_admins', 'total_questions', 'total_answers', 'total_messages')
+
+
+def _cache():
+    return caches['shared']
+
+
+def _key(name):
+    return f'{CACHE_PREFIX}{name}'
+
+
+def _counter_querysets():
+    from qna.models import Question, Answer
+    from users.models import Message
+
+    return {
+        'total_students': User.objects.filter(is_staff=False),
+        'total_admins': User.objects.filter(is_staff=True),
+        'total_questions': Question.objects.all(),
+        'total_answers': Answer.objects.all(),
+        'total_messages': Message.objects.all(),
+    }
+
+
+def compute_community_stats(names=COUNTERS):
+    """Count the given totals straight from the database"""
+    querysets = _counter_querysets()
+    return {name: querysets[name].count() for name in names}
+
+
+def reconcile_community_stats(names=COUNTERS):
+    """Recount the given totals and store the fresh values in the shared cache"""
+    stats = compute_community_stats(names)
+    expires = time.time() + RECONCILE_SECONDS
+    _cache().set_many({_key(name): (value, expires) for name, value in stats.items()}, RECONCILE_SECONDS)
+    return stats
+
+
+def get_community_stats():
+    """Return all totals, recounting only those that are missing or due"""
+    now = time.time()
+    cached = _cache().get_many([_key(name) for name in COUNTERS])
+    stats = {}
+    for name in COUNTERS:
+        entry = cached.get(_key(name))
+        if entry is not None and entry[1] > now:
+            stats[name] = entry[0]
+    missing = [name for name in COUNTERS if name not in stats]
+    if missing:
+        stats.update(reconcile_community_stats(missing))
+    return stats
+
+
+def _apply(name, delta):
+    cache = _cache()
+    # The database cache's incr is a read followed by a write; the IMMEDIATE
+    # transaction keeps concurrent processes from losing each other's updates
+    with transaction.atomic():
+        entry = cache.get(_key(name))
+        if entry is None:
+            # Not cached yet; the next read recounts from the database
+            return
+        value, expires = entry
+        remaining = expires - time.time()
+        if remaining > 0:
+            # Keep the original deadline so a busy counter is still reconciled
+            cache.set(_key(name), (value + delta, expires), remaining)
+
+
+def adjust_counter(name, delta):
+    """Shift a cached total by ``delta`` once the current transaction commits"""
+    transaction.on_commit(lambda: _apply(name, delta))
+
+
+def invalidate_counters(*names):
+    """Drop cached totals so the next read recounts them"""
+    transaction.on_commit(lambda: _cache().delete_many([_key(name) for name in names]))
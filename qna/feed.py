@@ -0,0 +1,57 @@
+"""
+Keyset (cursor) pagination for the question feed.
+
+Pages are ordered by (created_at, id) descending and each page is fetched with a
+range predicate on those two columns, so the cost of a page does not depend on
+how deep into the feed the reader is or how large the Question table grows.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+FEED_PAGE_SIZE = 20
+
+
+def encode_cursor(question):
+    """Build an opaque cursor token pointing just past the given question"""
+    raw = f"{question.created_at.isoformat()}|{question.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, id) for a cursor token, or None if it is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def get_feed_page(queryset, cursor=None, page_size=FEED_PAGE_SIZE):
+    """
+    Return (questions, next_cursor) for the page that follows ``cursor``.
+
+    ``next_cursor`` is None when there are no older questions left.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    # Fetch one extra row to find out whether an older page exists
+    questions = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(questions) > page_size:
+        questions = questions[:page_size]
+        next_cursor = encode_cursor(questions[-1])
+
+    return questions, next_cursor
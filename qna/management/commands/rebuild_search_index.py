@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the full-text question search index
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from qna.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 search index over question titles, details and answers'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Full-text search is only available on SQLite.')
+
+        self.stdout.write('Rebuilding question search index...')
+        with transaction.atomic():
+            indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {indexed} questions'))
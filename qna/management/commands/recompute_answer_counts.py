@@ -0,0 +1,31 @@
+"""
+Management command to repair the denormalized Question.answer_count column
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from qna.models import Question, Answer
+
+
+class Command(BaseCommand):
+    help = 'Recompute Question.answer_count from the Answer table in a single bulk UPDATE'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recomputing answer counts...')
+
+        counts = (Answer.objects.filter(question=OuterRef('pk'))
+                  .values('question').annotate(total=Count('id')).values('total'))
+        actual = Coalesce(Subquery(counts), 0)
+
+        with transaction.atomic():
+            drifted = Question.objects.annotate(actual=actual).exclude(answer_count=actual).count()
+            updated = Question.objects.update(answer_count=actual)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Recomputed {updated} questions\n'
+                f'✓ Corrected {drifted} drifted counters'
+            )
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_answer_counts(apps, schema_editor):
+    Question = apps.get_model('qna', 'Question')
+    Answer = apps.get_model('qna', 'Answer')
+    counts = (Answer.objects.filter(question=OuterRef('pk'))
+              .values('question').annotate(total=Count('id')).values('total'))
+    Question.objects.update(answer_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qna', '0004_answer_is_admin_response_question_answered_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answer_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_answer_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# FTS5 index over question title/details and the concatenated answer text,
+# keyed by question id (rowid) and kept in sync by triggers so bulk writes
+# that bypass model signals are indexed too.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS qna_question_fts USING fts5(
+        title, details, answers, tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_question_fts_ai AFTER INSERT ON qna_question BEGIN
+        INSERT INTO qna_question_fts (rowid, title, details, answers)
+        VALUES (new.id, new.title, new.details, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_question_fts_au AFTER UPDATE OF title, details ON qna_question BEGIN
+        UPDATE qna_question_fts SET title = new.title, details = new.details WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_question_fts_ad AFTER DELETE ON qna_question BEGIN
+        DELETE FROM qna_question_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_answer_fts_ai AFTER INSERT ON qna_answer BEGIN
+        UPDATE qna_question_fts SET answers = answers || ' ' || new.content
+        WHERE rowid = new.question_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_answer_fts_au AFTER UPDATE OF content ON qna_answer BEGIN
+        UPDATE qna_question_fts SET answers = coalesce(
+            (SELECT group_concat(content, ' ') FROM qna_answer WHERE question_id = new.question_id), ''
+        ) WHERE rowid = new.question_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS qna_answer_fts_ad AFTER DELETE ON qna_answer BEGIN
+        UPDATE qna_question_fts SET answers = coalesce(
+            (SELECT group_concat(content, ' ') FROM qna_answer WHERE question_id = old.question_id), ''
+        ) WHERE rowid = old.question_id;
+    END
+    """,
+    """
+    INSERT INTO qna_question_fts (rowid, title, details, answers)
+    SELECT q.id, q.title, q.details, coalesce(
+        (SELECT group_concat(a.content, ' ') FROM qna_answer a WHERE a.question_id = q.id), ''
+    )
+    FROM qna_question q
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS qna_answer_fts_ad',
+    'DROP TRIGGER IF EXISTS qna_answer_fts_au',
+    'DROP TRIGGER IF EXISTS qna_answer_fts_ai',
+    'DROP TRIGGER IF EXISTS qna_question_fts_ad',
+    'DROP TRIGGER IF EXISTS qna_question_fts_au',
+    'DROP TRIGGER IF EXISTS qna_question_fts_ai',
+    'DROP TABLE IF EXISTS qna_question_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qna', '0005_question_answer_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qna', '0006_question_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminquestionrecord',
+            index=models.Index(fields=['admin', 'answered_at'], name='qna_record_admin_answered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['status', 'is_private', '-created_at'], name='qna_q_status_private_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['assigned_admin', 'status'], name='qna_q_admin_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-created_at', '-id'], name='qna_q_created_id_idx'),
+        ),
+    ]
@@ -71,6 +71,17 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     assigned_at = models.DateTimeField(null=True, blank=True)
     answered_at = models.DateTimeField(null=True, blank=True)
+    answer_count = models.PositiveIntegerField(default=0)  # Maintained by qna.signals
+
+    class Meta:
+        indexes = [
+            # Public feed / queue filters ordered by recency
+            models.Index(fields=['status', 'is_private', '-created_at'], name='qna_q_status_private_idx'),
+            # Admin "my assigned questions" lookups
+            models.Index(fields=['assigned_admin', 'status'], name='qna_q_admin_status_idx'),
+            # Keyset pagination order for the home feed
+            models.Index(fields=['-created_at', '-id'], name='qna_q_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -105,6 +116,9 @@ class AdminQuestionRecord(models.Model):
     class Meta:
         unique_together = ['admin', 'question']  # One admin per question
         ordering = ['-assigned_at']
+        indexes = [
+            models.Index(fields=['admin', 'answered_at'], name='qna_record_admin_answered_idx'),
+        ]
     
     def __str__(self):
         return f"{self.admin.username} handling {self.question.title[:50]}"
@@ -0,0 +1,111 @@
+"""
+Full-text question search backed by the SQLite FTS5 table created in
+qna/migrations/0006_question_search_index.py.
+
+Results are ranked with bm25 (title matches weigh most, then details, then
+answers) and carry a highlighted snippet of the best-matching column.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import prefetch_related_objects
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Question
+
+SEARCH_RESULTS_LIMIT = 20
+
+# Column weights passed to bm25(): title, details, answers
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+# Sentinels wrapped around matches by snippet(); swapped for <mark> after escaping
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word is quoted so user input can never be parsed as FTS5 syntax,
+    and the last word is prefix-matched to support search-as-you-type.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """Escape a raw snippet and mark up the matched terms"""
+    html = escape(snippet)
+    html = html.replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')
+    return mark_safe(html)
+
+
+def search_questions(user, text, category=None, status=None, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Return up to ``limit`` questions matching ``text`` that ``user`` may see,
+    best match first. Each question gets ``rank`` and ``snippet`` attributes.
+    """
+    match = build_match_query(text)
+    if not match or connection.vendor != 'sqlite':
+        return []
+
+    where = ['qna_question_fts MATCH %s']
+    params = [match]
+
+    # Same visibility rule as question_detail: staff see everything, others
+    # see public questions plus private ones they wrote or were assigned
+    if not user.is_authenticated:
+        where.append('q.is_private = 0')
+    elif not user.is_staff:
+        where.append('(q.is_private = 0 OR q.author_id = %s OR q.assigned_admin_id = %s)')
+        params.extend([user.pk, user.pk])
+
+    if category:
+        where.append('q.category = %s')
+        params.append(category)
+    if status:
+        where.append('q.status = %s')
+        params.append(status)
+
+    sql = f"""
+        SELECT q.*,
+               bm25(qna_question_fts, {', '.join(str(w) for w in BM25_WEIGHTS)}) AS rank,
+               snippet(qna_question_fts, -1, %s, %s, '…', 16) AS raw_snippet
+        FROM qna_question_fts
+        JOIN qna_question q ON q.id = qna_question_fts.rowid
+        WHERE {' AND '.join(where)}
+        ORDER BY rank
+        LIMIT %s
+    """
+    params = [_MATCH_START, _MATCH_END] + params + [limit]
+
+    results = list(Question.objects.raw(sql, params))
+    prefetch_related_objects(results, 'author')
+    for question in results:
+        question.snippet = highlight(question.raw_snippet)
+    return results
+
+
+def rebuild_search_index():
+    """Repopulate the FTS5 table from scratch and return the number of rows indexed"""
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM qna_question_fts')
+        cursor.execute("""
+            INSERT INTO qna_question_fts (rowid, title, details, answers)
+            SELECT q.id, q.title, q.details, coalesce(
+                (SELECT group_concat(a.content, ' ') FROM qna_answer a WHERE a.question_id = q.id), ''
+            )
+            FROM qna_question q
+        """)
+        indexed = cursor.rowcount
+        cursor.execute("INSERT INTO qna_question_fts (qna_question_fts) VALUES ('optimize')")
+    return indexed
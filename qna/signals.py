@@ -0,0 +1,75 @@
+"""
+Django signals keeping denormalized Question counters and the cached
+community statistics in sync
+"""
+
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.models import Message
+from .community_stats import adjust_counter, invalidate_counters
+from .models import Question, Answer
+
+
+@receiver(post_save, sender=Answer)
+def increment_answer_count(sender, instance, created, **kwargs):
+    """
+    Bump the parent question's answer counter in a single UPDATE
+    """
+    if created:
+        Question.objects.filter(pk=instance.question_id).update(
+            answer_count=F('answer_count') + 1
+        )
+        adjust_counter('total_answers', 1)
+
+
+@receiver(post_delete, sender=Answer)
+def decrement_answer_count(sender, instance, **kwargs):
+    """
+    Drop the parent question's answer counter; also fires for answers removed
+    by the cascade when a question is deleted, where it simply matches no row
+    """
+    Question.objects.filter(pk=instance.question_id, answer_count__gt=0).update(
+        answer_count=F('answer_count') - 1
+    )
+    adjust_counter('total_answers', -1)
+
+
+@receiver(post_save, sender=Question)
+def question_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter('total_questions', 1)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    adjust_counter('total_questions', -1)
+
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter('total_messages', 1)
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    adjust_counter('total_messages', -1)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Count new accounts; a later save may have flipped is_staff, so the split
+    is recounted unless the save is known not to touch it (e.g. last_login)
+    """
+    if created:
+        adjust_counter('total_admins' if instance.is_staff else 'total_students', 1)
+    elif update_fields is None or 'is_staff' in update_fields:
+        invalidate_counters('total_students', 'total_admins')
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    adjust_counter('total_admins' if instance.is_staff else 'total_students', -1)
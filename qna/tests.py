@@ -1,3 +1,197 @@
+from io import StringIO
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.urls import reverse
+
+from .community_stats import get_community_stats
+from .feed import decode_cursor, get_feed_page
+from .search import search_questions
+from .models import Question, Answer
+from users.models import Notification, OutboxEvent, StudentPoints, UserProfile
+from users.outbox import process_batch
+
+
+class QuestionFeedTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        for i in range(25):
+            Question.objects.create(title=f'Question {i}', details='Details', author=self.user)
+
+    def test_pages_do_not_overlap(self):
+        first_page, cursor = get_feed_page(Question.objects.all(), page_size=10)
+        second_page, _ = get_feed_page(Question.objects.all(), cursor, page_size=10)
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(len(second_page), 10)
+        self.assertFalse({q.pk for q in first_page} & {q.pk for q in second_page})
+        self.assertGreater(first_page[-1].pk, second_page[0].pk)
+
+    def test_last_page_has_no_cursor(self):
+        _, cursor = get_feed_page(Question.objects.all(), page_size=20)
+        last_page, next_cursor = get_feed_page(Question.objects.all(), cursor, page_size=20)
+        self.assertEqual(len(last_page), 5)
+        self.assertIsNone(next_cursor)
+
+    def test_malformed_cursor_is_ignored(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+
+    def test_feed_api(self):
+        self.client.login(username='student', password='testpass123')
+        response = self.client.get(reverse('question_feed_api'))
+        data = response.json()
+        self.assertEqual(len(data['questions']), 20)
+        self.assertIsNotNone(data['next_cursor'])
+
+
+class AnswerCountTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.question = Question.objects.create(title='Question', details='Details', author=self.user)
+
+    def test_counter_follows_answers(self):
+        first = Answer.objects.create(question=self.question, content='One', author=self.user)
+        Answer.objects.create(question=self.question, content='Two', author=self.user)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 2)
+
+        first.delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 1)
+
+    def test_repair_command(self):
+        Answer.objects.create(question=self.question, content='One', author=self.user)
+        Question.objects.update(answer_count=7)
+        call_command('recompute_answer_counts', stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.answer_count, 1)
+
+
+class CommunityStatsTestCase(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='student', password='testpass123')
+
+    def test_counters_follow_signals(self):
+        self.assertEqual(get_community_stats()['total_questions'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(title='Question', details='Details', author=self.user)
+            Answer.objects.create(question=question, content='Answer', author=self.user)
+            User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+
+        with self.assertNumQueries(1):  # One shared cache read, no COUNTs
+            stats = get_community_stats()
+        self.assertEqual(stats['total_questions'], 1)
+        self.assertEqual(stats['total_answers'], 1)
+        self.assertEqual(stats['total_students'], 1)
+        self.assertEqual(stats['total_admins'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.delete()
+        stats = get_community_stats()
+        self.assertEqual(stats['total_questions'], 0)
+        self.assertEqual(stats['total_answers'], 0)
+
+    def test_stats_endpoint_is_query_free_when_warm(self):
+        get_community_stats()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('community_stats_api'))
+        self.assertEqual(response.json()['data']['total_students'], 1)
+
+    def test_counters_are_shared_between_processes(self):
+        get_community_stats()
+        # A separate cache connection stands in for another process
+        other_process = caches.create_connection('shared')
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(title='Question', details='Details', author=self.user)
+        value, expires = other_process.get('community_stats:total_questions')
+        self.assertEqual(value, 1)
+
+    def test_missing_counter_is_recounted(self):
+        get_community_stats()
+        caches['shared'].delete('community_stats:total_students')
+        User.objects.create_user(username='another', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_community_stats()
+        counts = [
+            query['sql'] for query in queries
+            if 'COUNT' in query['sql'] and 'askup_shared_cache' not in query['sql']
+        ]
+        self.assertEqual(len(counts), 1)  # Only the missing total is recounted
+        self.assertEqual(stats['total_students'], 2)
+
+
+class QuestionSearchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.public = Question.objects.create(
+            title='Recursion in Python', details='How does a recursive function return?',
+            category='python', author=self.other
+        )
+        self.private = Question.objects.create(
+            title='Private recursion doubt', details='Secret', category='python',
+            author=self.other, is_private=True
+        )
+        Answer.objects.create(question=self.public, content='Think about the base case', author=self.user)
+
+    def test_ranked_search_respects_visibility(self):
+        results = search_questions(self.user, 'recursion')
+        self.assertEqual([q.pk for q in results], [self.public.pk])
+        self.assertIn('<mark>', results[0].snippet)
+        self.assertEqual(len(search_questions(self.other, 'recursion')), 2)
+
+    def test_answers_and_filters(self):
+        self.assertEqual(len(search_questions(self.user, 'base case')), 1)
+        self.assertEqual(len(search_questions(self.user, 'recursion', category='history')), 0)
+        self.assertEqual(len(search_questions(self.user, 'recursion', status='answered')), 0)
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search_questions(self.user, 'recurs')), 1)
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='testpass123')
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.question = Question.objects.create(title='Question', details='Details', author=self.student)
+
+    def test_answer_side_effects_are_deferred_to_the_worker(self):
+        self.client.login(username='admin', password='testpass123')
+        self.client.post(reverse('question_detail', args=[self.question.pk]),
+                         {'action': 'answer_question', 'content': 'An answer'})
+        self.client.post(reverse('question_detail', args=[self.question.pk]),
+                         {'action': 'answer_question', 'content': 'Another answer'})
+
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=True).count(), 2)
+        self.assertFalse(Notification.objects.filter(user=self.student).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(process_batch(), (2, 0))
+        # Both awards land in the ledger with one write
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT INTO "users_pointstransaction"')]), 1)
+        self.assertEqual(UserProfile.objects.get(user=self.admin).answers_given, 2)
+        self.assertEqual(Notification.objects.filter(user=self.student, notification_type='new_answer').count(), 2)
+        points = StudentPoints.objects.get(student=self.admin).total_points
+
+        # Already processed events are never applied again
+        self.assertEqual(process_batch(), (0, 0))
+        self.assertEqual(StudentPoints.objects.get(student=self.admin).total_points, points)
+
+    def test_failing_event_does_not_hold_back_the_others(self):
+        self.client.login(username='student', password='testpass123')
+        self.client.post(reverse('ask_question'), {'title': 'Q', 'details': 'D', 'category': 'other'})
+        # A malformed event in the same user's group fails the group, then
+        # only itself when the events are retried one by one
+        OutboxEvent.objects.create(user=self.student, event_type='answer_posted',
+                                   payload={'question_author_id': self.admin.pk})
 
-# Create your tests here.
+        self.assertEqual(process_batch(), (1, 1))
+        self.assertEqual(UserProfile.objects.get(user=self.student).questions_asked, 1)
+        self.assertEqual(StudentPoints.objects.get(student=self.student).questions_points, 10)
+        self.assertEqual(list(OutboxEvent.objects.values_list('attempts', flat=True)), [0, 1])
+        self.assertEqual(OutboxEvent.objects.filter(processed_at__isnull=True).count(), 1)
@@ -3,8 +3,10 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('api/feed/', views.question_feed_api, name='question_feed_api'),
     path('api/community-stats/', views.community_stats_api, name='community_stats_api'),
     path('about/', views.about, name='about'),
+    path('search/', views.search, name='search'),
     path('question/<int:pk>/', views.question_detail, name='question_detail'),
     path('question/<int:pk>/delete/', views.delete_question, name='delete_question'),
     path('ask/', views.ask_question, name='ask_question'),
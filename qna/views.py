@@ -1,54 +1,127 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.models import User
 from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.text import Truncator
 from .models import Question, Answer, AdminQuestionRecord
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils import timezone
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q, Avg
 from datetime import datetime
 from users.gamification import GamificationManager
-from users.models import Notification
+from users.outbox import ANSWER_POSTED, QUESTION_ASKED, record_event
+from .community_stats import get_community_stats
+from .feed import get_feed_page
+from .search import search_questions
+
+
+def get_feed_queryset(user):
+    """Return the unordered feed queryset for the given user's role"""
+    if user.is_authenticated:
+        if user.is_staff:
+            # Admins see open/assigned questions plus anything directly assigned to them
+            return Question.objects.filter(
+                Q(status__in=['open', 'assigned']) | Q(assigned_admin=user)
+            )
+        # Students see their own questions plus public/open questions to keep the feed active
+        return Question.objects.filter(
+            Q(author=user) |
+            Q(is_private=False, status='open')
+        )
+    # Anonymous users see public open questions only
+    return Question.objects.filter(is_private=False, status='open')
+
 
 # Home Page – show questions based on user role
 def home(request):
+    queryset = get_feed_queryset(request.user).select_related('author', 'assigned_admin')
     if request.user.is_authenticated:
-        if request.user.is_staff:
-            # Admins see open/assigned questions plus anything directly assigned to them
-            questions = Question.objects.filter(
-                Q(status__in=['open', 'assigned']) | Q(assigned_admin=request.user)
-            ).distinct().order_by('-created_at')
-        else:
-            # Students see their own questions plus public/open questions to keep the feed active
-            questions = Question.objects.filter(
-                Q(author=request.user) |
-                Q(is_private=False, status='open')
-            ).distinct().order_by('-created_at')
+        questions, next_cursor = get_feed_page(queryset, request.GET.get('cursor'))
     else:
-        # Anonymous users see public open questions only
-        questions = Question.objects.filter(is_private=False, status='open').order_by('-created_at')[:10]
+        # Anonymous visitors only get a short teaser of the newest questions
+        questions = queryset.order_by('-created_at', '-id')[:10]
+        next_cursor = None
 
+    stats = get_community_stats()
     context = {
         'questions': questions,
-        'total_students': User.objects.filter(is_staff=False).count(),
-        'total_admins': User.objects.filter(is_staff=True).count(),
-        'total_questions': Question.objects.count(),
-        'total_answers': Answer.objects.count(),
+        'next_cursor': next_cursor,
+        'total_students': stats['total_students'],
+        'total_admins': stats['total_admins'],
+        'total_questions': stats['total_questions'],
+        'total_answers': stats['total_answers'],
     }
 
     return render(request, 'qna/home.html', context)
 
 
 def community_stats_api(request):
+    stats = get_community_stats()
     data = {
-        'total_students': User.objects.filter(is_staff=False).count(),
-        'total_admins': User.objects.filter(is_staff=True).count(),
-        'total_questions': Question.objects.count(),
-        'total_answers': Answer.objects.count(),
+        'total_students': stats['total_students'],
+        'total_admins': stats['total_admins'],
+        'total_questions': stats['total_questions'],
+        'total_answers': stats['total_answers'],
         'average_rating': 4.9,
     }
     return JsonResponse({'success': True, 'data': data})
 
+
+@login_required
+def question_feed_api(request):
+    """JSON page of the home feed for infinite scroll"""
+    queryset = get_feed_queryset(request.user).select_related('author')
+    questions, next_cursor = get_feed_page(queryset, request.GET.get('cursor'))
+
+    questions_data = []
+    for question in questions:
+        questions_data.append({
+            'id': question.pk,
+            'title': question.title,
+            'details': Truncator(question.details).words(20),
+            'category': question.category,
+            'category_display': question.get_category_display(),
+            'status': question.status,
+            'author': question.author.first_name or question.author.username,
+            'created_at': question.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'url': reverse('question_detail', args=[question.pk]),
+        })
+
+    return JsonResponse({
+        'success': True,
+        'questions': questions_data,
+        'next_cursor': next_cursor,
+    })
+
+
+def search(request):
+    """Full-text question search with category and status filters"""
+    query = request.GET.get('q', '').strip()
+    category_filter = request.GET.get('category', '')
+    status_filter = request.GET.get('status', '')
+
+    results = []
+    if query:
+        results = search_questions(
+            request.user, query,
+            category=category_filter or None,
+            status=status_filter or None,
+        )
+
+    context = {
+        'query': query,
+        'results': results,
+        'category_filter': category_filter,
+        'status_filter': status_filter,
+        'categories': Question.CATEGORY_CHOICES,
+        'statuses': Question.STATUS_CHOICES,
+    }
+
+    return render(request, 'qna/search.html', context)
+
+
 # Question Detail – view answers and add a new one
 @login_required
 def question_detail(request, pk):
@@ -68,7 +141,7 @@ def question_detail(request, pk):
                 question.assigned_admin = request.user
                 question.status = 'assigned'
                 question.assigned_at = timezone.now()
-                question.save()
+                question.save(update_fields=['assigned_admin', 'status', 'assigned_at'])
                 
                 # Create admin record
                 AdminQuestionRecord.objects.create(
@@ -86,68 +159,27 @@ def question_detail(request, pk):
             admin_notes = request.POST.get("admin_notes", "")
             
             if content:
-                # Create the answer
-                answer = Answer.objects.create(
-                    question=question,
-                    content=content,
-                    author=request.user,
-                    is_admin_response=request.user.is_staff
-                )
-                
-                # Get or create user profile
-                from users.views import get_or_create_profile
-                profile = get_or_create_profile(request.user)
-                
-                # Award points for providing answer
-                gamification_result = GamificationManager.award_points(
-                    request.user,
-                    'first_answer' if profile.answers_given == 0 else 'answer_given'
-                )
-                
-                # Update user profile
-                profile.answers_given += 1
-                profile.save()
-                
-                # Notify question author about new answer
-                if question.author != request.user:
-                    Notification.objects.create(
-                        user=question.author,
-                        title='New Answer to Your Question!',
-                        message=f'{request.user.first_name or request.user.username} answered your question "{question.title[:50]}..."',
-                        notification_type='new_answer',
-                        action_url=f'/question/{question.pk}/',
-                        icon='fas fa-comment',
-                        color='info'
+                # Create the answer; the answer_count bump and the outbox event
+                # for points and notifications commit with it
+                with transaction.atomic():
+                    Answer.objects.create(
+                        question=question,
+                        content=content,
+                        author=request.user,
+                        is_admin_response=request.user.is_staff
                     )
-                
-                # Create notifications for achievements
-                if gamification_result['new_achievements']:
-                    for achievement in gamification_result['new_achievements']:
-                        Notification.objects.create(
-                            user=request.user,
-                            title=f'Achievement Unlocked: {achievement.name}!',
-                            message=f'Congratulations! You earned the "{achievement.name}" badge: {achievement.description}',
-                            notification_type='achievement_earned',
-                            icon=achievement.icon,
-                            color='success'
-                        )
-                
-                # Level up notification
-                if gamification_result['level_up']:
-                    Notification.objects.create(
-                        user=request.user,
-                        title=f'Level Up! You are now Level {gamification_result["new_level"]}',
-                        message=f'Amazing progress! You\'ve reached Level {gamification_result["new_level"]} and earned {gamification_result["points_awarded"]} points!',
-                        notification_type='level_up',
-                        icon='fas fa-star',
-                        color='warning'
+                    record_event(
+                        request.user, ANSWER_POSTED,
+                        question_id=question.pk,
+                        question_title=question.title,
+                        question_author_id=question.author_id
                     )
                 
                 # If admin is answering, update question status and record
                 if request.user.is_staff:
                     question.status = 'answered'
                     question.answered_at = timezone.now()
-                    question.save()
+                    question.save(update_fields=['status', 'answered_at'])
                     
                     # Update admin record
                     try:
@@ -200,55 +232,18 @@ def ask_question(request):
         category = request.POST.get('category')
         
         if title and details and category:
-            question = Question.objects.create(
-                title=title,
-                details=details,
-                category=category,
-                author=request.user
-            )
-            
-            # Get or create user profile
-            from users.views import get_or_create_profile
-            profile = get_or_create_profile(request.user)
-            
-            # Award points for asking question
-            gamification_result = GamificationManager.award_points(
-                request.user, 
-                'first_question' if profile.questions_asked == 0 else 'question_asked'
-            )
-            
-            # Update user profile
-            profile.questions_asked += 1
-            profile.save()
-            
-            # Create notifications for achievements
-            if gamification_result['new_achievements']:
-                for achievement in gamification_result['new_achievements']:
-                    Notification.objects.create(
-                        user=request.user,
-                        title=f'Achievement Unlocked: {achievement.name}!',
-                        message=f'Congratulations! You earned the "{achievement.name}" badge: {achievement.description}',
-                        notification_type='achievement_earned',
-                        icon=achievement.icon,
-                        color='success'
-                    )
-            
-            # Level up notification
-            if gamification_result['level_up']:
-                Notification.objects.create(
-                    user=request.user,
-                    title=f'Level Up! You are now Level {gamification_result["new_level"]}',
-                    message=f'Amazing progress! You\'ve reached Level {gamification_result["new_level"]} and earned {gamification_result["points_awarded"]} points!',
-                    notification_type='level_up',
-                    icon='fas fa-star',
-                    color='warning'
+            # Points, streaks, badges and notifications are applied by the
+            # process_outbox worker once this commits
+            with transaction.atomic():
+                question = Question.objects.create(
+                    title=title,
+                    details=details,
+                    category=category,
+                    author=request.user
                 )
+                record_event(request.user, QUESTION_ASKED, question_id=question.pk)
             
-            success_msg = f'Your question has been posted! You earned {gamification_result["points_awarded"]} points.'
-            if gamification_result['level_up']:
-                success_msg += f' Level up! You are now Level {gamification_result["new_level"]}!'
-            
-            messages.success(request, success_msg)
+            messages.success(request, 'Your question has been posted! Your points will be added shortly.')
             return redirect('home')
         else:
             messages.error(request, 'Please fill in all required fields.')
@@ -269,6 +264,7 @@ def delete_question(request, pk):
     
     if request.method == 'POST':
         question_title = question.title
+        question_pk = question.pk
         question.delete()
         
         # Award negative points for deleting (to prevent abuse)
@@ -279,15 +275,11 @@ def delete_question(request, pk):
                 profile.questions_asked -= 1
                 profile.save()
             
-            # Deduct points (but don't let total points go below 0)
-            points_obj = GamificationManager.get_or_create_points(request.user)
-            if points_obj.total_points >= 3:  # Only deduct if user has enough points
-                GamificationManager.award_points(request.user, 'question_deleted', -3)
-            else:
-                # If user has less than 3 points, just set to 0
-                points_obj.total_points = 0
-                points_obj.questions_points = max(0, points_obj.questions_points - 3)
-                points_obj.save()
+            # Deduct points through the ledger (totals never go below 0)
+            GamificationManager.award_points(
+                request.user, 'question_deleted', -3,
+                idempotency_key=f'question_deleted:{question_pk}'
+            )
         
         messages.success(request, f'Question "{question_title}" has been deleted.')
         return redirect('home')
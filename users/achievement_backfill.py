@@ -0,0 +1,145 @@
+"""
+Achievement backfill for AskUP
+Awards new or re-tuned achievements to every student who already qualifies,
+instead of waiting for their next point award. Students are split into
+student-id partitions; each partition reads its points columns into compact
+integer arrays and, rule by rule, compares the column against the threshold in
+a plain Python pass, returning the qualifying (student, achievement) pairs
+along with each student's progress toward the rule. Partitions run across a
+process pool and the parent bulk_creates the pairs, ignoring the ones already
+earned, and upserts the progress rows.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import compress
+
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+
+from .achievement_rules import METRICS, compile_rule
+from .models import Achievement, AchievementProgress, StudentAchievement, StudentPoints
+
+PARTITION_SIZE = 5000
+BATCH_SIZE = 1000
+
+
+def partitions(partition_size=PARTITION_SIZE):
+    """Half-open student id ranges covering every StudentPoints row"""
+    bounds = StudentPoints.objects.aggregate(low=Min('student_id'), high=Max('student_id'))
+    if bounds['low'] is None:
+        return []
+    return [
+        (low, min(low + partition_size, bounds['high'] + 1))
+        for low in range(bounds['low'], bounds['high'] + 1, partition_size)
+    ]
+
+
+def evaluate_partition(achievement_ids, low, high):
+    """
+    Qualifying (student_id, achievement_id) pairs within one id range, and
+    (student_id, achievement_id, value, target) progress rows for every
+    student who has started on a rule
+    """
+    rules = [
+        rule for rule in map(compile_rule, Achievement.objects.filter(id__in=achievement_ids, is_active=True))
+        if rule is not None
+    ]
+    if not rules:
+        return [], []
+
+    student_ids = array('q')
+    columns = {metric: array('q') for metric in METRICS}
+    rows = (
+        StudentPoints.objects.filter(student_id__gte=low, student_id__lt=high)
+        .values_list('student_id', *METRICS)
+    )
+    for student_id, *values in rows:
+        student_ids.append(student_id)
+        for metric, value in zip(METRICS, values):
+            columns[metric].append(value or 0)
+
+    pairs = []
+    progress = []
+    for rule in rules:
+        threshold = rule.threshold
+        achievement_id = rule.achievement.id
+        column = columns[rule.metric]
+        mask = [value >= threshold for value in column]
+        pairs.extend((student_id, achievement_id) for student_id in compress(student_ids, mask))
+        started = [value > 0 for value in column]
+        progress.extend(
+            (student_id, achievement_id, min(value, threshold), threshold)
+            for student_id, value in compress(zip(student_ids, column), started)
+        )
+    return pairs, progress
+
+
+def _evaluate(args):
+    return evaluate_partition(*args)
+
+
+def _init_worker():
+    import django
+    django.setup()  # No-op when the worker was forked from a configured parent
+    # Never share the parent's database handles
+    connections.close_all()
+
+
+def backfill(achievements=None, workers=1, partition_size=PARTITION_SIZE, progress=None):
+    """
+    Award ``achievements`` (all active ones by default) to every qualifying
+    student. Returns the number of StudentAchievement rows created.
+    """
+    if achievements is None:
+        achievements = Achievement.objects.filter(is_active=True)
+    achievement_ids = [achievement.id for achievement in achievements]
+    jobs = [(achievement_ids, low, high) for low, high in partitions(partition_size)]
+    if not jobs or not achievement_ids:
+        return 0
+
+    before = StudentAchievement.objects.filter(achievement_id__in=achievement_ids).count()
+    if workers <= 1:
+        _insert_results(map(_evaluate, jobs), progress)
+    elif connection.is_in_memory_db():
+        # Other processes cannot open an in-memory database (e.g. the test
+        # database), so fan out to threads instead. Their reads would collide
+        # with the inserts on SQLite's shared in-memory cache, so every
+        # partition is evaluated before anything is written.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate, jobs))
+        _insert_results(results, progress)
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            _insert_results(pool.map(_evaluate, jobs), progress)
+    return StudentAchievement.objects.filter(achievement_id__in=achievement_ids).count() - before
+
+
+def _insert_results(results, progress, batch_size=BATCH_SIZE):
+    """
+    Insert each partition's pairs, skipping the ones already earned, and
+    upsert its progress rows. Like any bulk_create this skips signals.
+    """
+    for done, (pairs, rows) in enumerate(results, 1):
+        with transaction.atomic():
+            StudentAchievement.objects.bulk_create(
+                [
+                    StudentAchievement(student_id=student_id, achievement_id=achievement_id, progress_percentage=100.0)
+                    for student_id, achievement_id in pairs
+                ],
+                ignore_conflicts=True,
+                batch_size=batch_size
+            )
+            AchievementProgress.objects.bulk_create(
+                [
+                    AchievementProgress(student_id=student_id, achievement_id=achievement_id, value=value, target=target)
+                    for student_id, achievement_id, value, target in rows
+                ],
+                update_conflicts=True,
+                unique_fields=['student', 'achievement'],
+                update_fields=['value', 'target', 'updated_at'],
+                batch_size=batch_size
+            )
+        if progress:
+            progress(done)
@@ -0,0 +1,216 @@
+"""
+Achievement rule engine for AskUP
+Compiles the achievement catalog once into threshold-sorted rules per metric,
+so a point award only evaluates the achievements whose thresholds it crossed
+instead of scanning (and string-matching) the whole catalog every time.
+The compiled index is rebuilt whenever Achievement rows change: signals bump
+a catalog version in the shared cache, which every process (the outbox
+worker included) checks before using its compiled copy. Each copy is also
+recompiled after REFRESH_SECONDS, which covers edits that bypass signals.
+"""
+
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'achievement_rules:version'
+REFRESH_SECONDS = 300
+
+# Category -> StudentPoints column; other categories count total points
+CATEGORY_METRICS = {
+    'questions': 'questions_points',
+    'answers': 'answers_points',
+    'helping': 'helping_points',
+    'consistency': 'consistency_points',
+}
+
+# Achievements without a points requirement, matched on phrases in their name
+NAMED_RULES = [
+    (('first question',), 'questions_points', 1),
+    (('first answer',), 'answers_points', 1),
+    (('streak', '7 day'), 'current_streak', 7),
+    (('streak', '30 day'), 'current_streak', 30),
+    (('level', 'level 5'), 'level', 5),
+    (('level', 'level 10'), 'level', 10),
+]
+
+# The platform's starter catalog, seeded by migration
+DEFAULT_ACHIEVEMENTS = [
+    {
+        'name': 'First Question',
+        'description': 'Asked your first question',
+        'icon': 'fas fa-question-circle',
+        'points_required': 0,
+        'category': 'questions',
+        'color': 'bronze'
+    },
+    {
+        'name': 'First Answer',
+        'description': 'Provided your first answer',
+        'icon': 'fas fa-comment',
+        'points_required': 0,
+        'category': 'answers',
+        'color': 'bronze'
+    },
+    {
+        'name': 'Curious Mind',
+        'description': 'Asked 10 questions',
+        'icon': 'fas fa-brain',
+        'points_required': 50,
+        'category': 'questions',
+        'color': 'silver'
+    },
+    {
+        'name': 'Helper',
+        'description': 'Provided 10 helpful answers',
+        'icon': 'fas fa-hands-helping',
+        'points_required': 100,
+        'category': 'answers',
+        'color': 'silver'
+    },
+    {
+        'name': 'Consistent Learner',
+        'description': 'Maintained a 7-day learning streak',
+        'icon': 'fas fa-fire',
+        'points_required': 35,
+        'category': 'consistency',
+        'color': 'gold'
+    },
+    {
+        'name': 'Expert',
+        'description': 'Reached Level 5',
+        'icon': 'fas fa-star',
+        'points_required': 2500,
+        'category': 'expertise',
+        'color': 'gold'
+    },
+    {
+        'name': 'Master',
+        'description': 'Reached Level 10',
+        'icon': 'fas fa-crown',
+        'points_required': 10000,
+        'category': 'expertise',
+        'color': 'platinum'
+    },
+    {
+        'name': 'Community Builder',
+        'description': 'Helped 50 students with answers',
+        'icon': 'fas fa-users',
+        'points_required': 500,
+        'category': 'community',
+        'color': 'gold'
+    }
+]
+
+METRICS = ('total_points', 'level', 'current_streak') + tuple(CATEGORY_METRICS.values())
+
+Rule = namedtuple('Rule', ['metric', 'threshold', 'achievement'])
+
+
+def compile_rule(achievement):
+    """Translate an Achievement into a Rule, or None if it can never be earned"""
+    if achievement.points_required > 0:
+        metric = CATEGORY_METRICS.get(achievement.category, 'total_points')
+        return Rule(metric, achievement.points_required, achievement)
+
+    name = achievement.name.lower()
+    for phrases, metric, threshold in NAMED_RULES:
+        if all(phrase in name for phrase in phrases):
+            return Rule(metric, threshold, achievement)
+    return None
+
+
+def metric_values(points_obj):
+    """The values rules are checked against, read from a StudentPoints row"""
+    return {metric: getattr(points_obj, metric) or 0 for metric in METRICS}
+
+
+class AchievementRuleIndex:
+    """Active achievement rules per metric, sorted by threshold"""
+
+    def __init__(self, achievements):
+        self.rules = {}
+        for achievement in achievements:
+            rule = compile_rule(achievement)
+            if rule is not None:
+                self.rules.setdefault(rule.metric, []).append(rule)
+        for rules in self.rules.values():
+            rules.sort(key=lambda rule: rule.threshold)
+        self.thresholds = {
+            metric: [rule.threshold for rule in rules] for metric, rules in self.rules.items()
+        }
+
+    def crossed(self, before, after):
+        """Rules whose threshold lies in (before, after] for some metric"""
+        found = []
+        for metric, thresholds in self.thresholds.items():
+            old, new = before.get(metric, 0), after.get(metric, 0)
+            if new > old:
+                found.extend(self.rules[metric][bisect_right(thresholds, old):bisect_right(thresholds, new)])
+        return found
+
+    def pending(self, before, after):
+        """Rules not met by ``before`` on every metric that changed"""
+        found = []
+        for metric, thresholds in self.thresholds.items():
+            old = before.get(metric, 0)
+            if after.get(metric, 0) != old:
+                found.extend(self.rules[metric][bisect_right(thresholds, old):])
+        return found
+
+    def met(self, values):
+        """Every rule satisfied by ``values``"""
+        found = []
+        for metric, thresholds in self.thresholds.items():
+            found.extend(self.rules[metric][:bisect_right(thresholds, values.get(metric, 0))])
+        return found
+
+    def __len__(self):
+        return sum(len(rules) for rules in self.rules.values())
+
+
+# This process's compiled copy of the catalog
+_compiled = {'version': None, 'index': None, 'compiled_at': 0}
+
+
+def _get_version():
+    shared = caches['shared']
+    version = shared.get(VERSION_KEY)
+    if version is None:
+        shared.add(VERSION_KEY, time.time_ns(), None)
+        version = shared.get(VERSION_KEY, 0)
+    return version
+
+
+def _bump():
+    caches['shared'].set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_rule_index():
+    """Return the compiled rule index, recompiling it if the catalog changed"""
+    from .models import Achievement
+
+    version = _get_version()
+    if (
+        _compiled['index'] is None
+        or _compiled['version'] != version
+        or time.monotonic() - _compiled['compiled_at'] > REFRESH_SECONDS
+    ):
+        _compiled['index'] = AchievementRuleIndex(Achievement.objects.filter(is_active=True))
+        _compiled['version'] = version
+        _compiled['compiled_at'] = time.monotonic()
+    return _compiled['index']
+
+
+def invalidate_rule_index():
+    """
+    Recompile this process's index on next use, and bump the shared version
+    once the transaction commits so every other process recompiles too (a bump
+    made before the commit could be read, and the old catalog recompiled,
+    before the change is visible to them)
+    """
+    _compiled['index'] = None
+    transaction.on_commit(_bump)
@@ -0,0 +1,110 @@
+"""
+StudentActivity retention for AskUP
+award_points logs one StudentActivity row per award. Rows older than the
+retention window are folded into per-student, per-type daily rollups
+(StudentActivityRollup) and deleted in bounded batches. Readers combine the
+rollups with the raw rows still inside the window, so the counts they report
+do not change when compaction runs.
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import StudentActivity, StudentActivityRollup
+
+BATCH_SIZE = 1000
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def retention_cutoff(days=None):
+    """Start of the oldest day whose raw rows are kept"""
+    if days is None:
+        days = settings.ACTIVITY_RETENTION_DAYS
+    return start_of_day(timezone.localdate() - timedelta(days=days))
+
+
+def compact_batch(cutoff, batch_size=BATCH_SIZE):
+    """
+    Fold up to ``batch_size`` of the oldest rows before ``cutoff`` into the
+    rollups and delete them, in one transaction. Returns the rows folded.
+    """
+    with transaction.atomic():
+        ids = list(
+            StudentActivity.objects.select_for_update()
+            .filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        counts = Counter({
+            (row['student_id'], row['activity_type'], row['day']): row['n']
+            for row in (
+                StudentActivity.objects.filter(id__in=ids)
+                .annotate(day=TruncDate('timestamp'))
+                .order_by()
+                .values('student_id', 'activity_type', 'day')
+                .annotate(n=Count('id'))
+            )
+        })
+        existing = StudentActivityRollup.objects.select_for_update().filter(
+            student_id__in={student_id for student_id, _, _ in counts},
+            date__in={day for _, _, day in counts}
+        )
+        updated = []
+        for rollup in existing:
+            key = (rollup.student_id, rollup.activity_type, rollup.date)
+            if key in counts:
+                rollup.count += counts.pop(key)
+                updated.append(rollup)
+
+        StudentActivityRollup.objects.bulk_update(updated, ['count'])
+        StudentActivityRollup.objects.bulk_create([
+            StudentActivityRollup(student_id=student_id, activity_type=activity_type, date=day, count=count)
+            for (student_id, activity_type, day), count in counts.items()
+        ])
+        StudentActivity.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def compact(days=None, batch_size=BATCH_SIZE, progress=None):
+    """Fold every row older than the retention window; returns the rows folded"""
+    cutoff = retention_cutoff(days)
+    folded = 0
+    while True:
+        done = compact_batch(cutoff, batch_size)
+        if not done:
+            return folded
+        folded += done
+        if progress:
+            progress(folded)
+
+
+def activity_counts(since, student=None):
+    """
+    Activities per type from ``since`` (a date) onwards, read from the
+    rollups for compacted days and from the raw rows for the rest
+    """
+    raw = StudentActivity.objects.filter(timestamp__gte=start_of_day(since))
+    rollups = StudentActivityRollup.objects.filter(date__gte=since)
+    if student is not None:
+        raw = raw.filter(student=student)
+        rollups = rollups.filter(student=student)
+
+    counts = Counter(dict(
+        raw.order_by().values('activity_type').annotate(n=Count('id')).values_list('activity_type', 'n')
+    ))
+    counts.update(dict(
+        rollups.order_by().values('activity_type').annotate(n=Sum('count')).values_list('activity_type', 'n')
+    ))
+    return counts
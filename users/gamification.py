@@ -4,9 +4,17 @@ Handles points, achievements, and level progression
 """
 
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, ExpressionWrapper, F, FloatField, IntegerField, OuterRef
+from django.db.models.functions import Cast, Greatest, Sqrt
 from django.utils import timezone
-from datetime import date, timedelta
-from .models import StudentPoints, Achievement, StudentAchievement, LearningStreak, StudentActivity
+from datetime import date
+from .models import UserProfile, StudentPoints, PointsTransaction, Achievement, StudentAchievement, AchievementProgress, LearningStreak, StudentActivity
+from .achievement_rules import DEFAULT_ACHIEVEMENTS, compile_rule, get_rule_index, metric_values
+from .leaderboard import Leaderboard
+from .ranking import PointsRankIndex
+from .status_snapshot import invalidate_user_status
+from .streaks import StreakEngine
 
 class GamificationManager:
     """Manages all gamification features"""
@@ -41,183 +49,256 @@ class GamificationManager:
         return points
     
     @classmethod
-    def award_points(cls, user, activity_type, points_override=None):
-        """Award points to user for activity"""
-        if not user.is_authenticated:
-            return False
-        
-        # Ensure UserProfile exists
-        from .models import UserProfile
-        profile, created = UserProfile.objects.get_or_create(user=user)
-            
-        points_obj = cls.get_or_create_points(user)
-        points_to_add = points_override or cls.POINTS.get(activity_type, 0)
-        
-        # Add points to appropriate category
-        if activity_type in ['question_asked', 'first_question']:
-            points_obj.questions_points = max(0, points_obj.questions_points + points_to_add)
+    def provision_user(cls, user):
+        """
+        Create the profile and points rows of a newly created user. The
+        points row is registered with the rank index and the leaderboard in
+        bulk, as provision_missing_rows does, instead of through its signals.
+        """
+        with transaction.atomic():
+            UserProfile.objects.create(user=user)
+            points_obj, = StudentPoints.objects.bulk_create([
+                StudentPoints(student=user, total_points=0, level=1, current_streak=0, longest_streak=0)
+            ])
+            PointsRankIndex.add(points_obj.total_points)
+            if not user.is_staff:
+                Leaderboard.add_many([user.id], Leaderboard.scores(points_obj))
+    
+    @classmethod
+    def get_points_column(cls, activity_type):
+        """StudentPoints category column credited for an activity"""
+        if activity_type in ['question_asked', 'first_question', 'question_deleted']:
+            return 'questions_points'
         elif activity_type in ['answer_given', 'answer_accepted', 'helpful_answer', 'first_answer']:
-            points_obj.answers_points = max(0, points_obj.answers_points + points_to_add)
+            return 'answers_points'
         elif 'streak' in activity_type:
-            points_obj.consistency_points = max(0, points_obj.consistency_points + points_to_add)
-        elif activity_type == 'question_deleted':
-            # Handle negative points for deletion
-            points_obj.questions_points = max(0, points_obj.questions_points + points_to_add)
-        else:
-            points_obj.helping_points = max(0, points_obj.helping_points + points_to_add)
-        
-        # Update total points (allow negative total but ensure categories stay non-negative)
-        points_obj.total_points += points_to_add
-        # Ensure total points don't go below 0
-        points_obj.total_points = max(0, points_obj.total_points)
-        
-        # Check for level up
-        level_up = points_obj.update_level()
+            return 'consistency_points'
+        return 'helping_points'
+    
+    @classmethod
+    def award_points(cls, user, activity_type, points_override=None, idempotency_key=None):
+        """
+        Award points to user for activity.
         
-        # Update streak
-        cls.update_streak(user)
+        Every change is appended to the PointsTransaction ledger and the
+        StudentPoints projection is advanced with the same folding rules the
+        ledger replay uses: the student's row is locked once and every column
+        change (category, total, level, streak and the day's streak bonus) is
+        applied in a single UPDATE with F() expressions. An award whose
+        ``idempotency_key`` is already in the ledger is not applied again.
+        """
+        return cls.award_many(user, [(activity_type, points_override, idempotency_key)])
+    
+    @classmethod
+    def award_many(cls, user, awards):
+        """
+        Award several activities at once, as award_points would one after
+        another but with a single lock, projection UPDATE and ledger insert.
         
-        points_obj.save()
+        ``awards`` is a list of (activity_type, points_override,
+        idempotency_key) tuples; awards whose key is already in the ledger
+        are skipped.
+        """
+        if not user.is_authenticated:
+            return False
         
-        # Log activity
-        StudentActivity.objects.create(
-            student=user,
-            activity_type=activity_type,
-            description=f"Earned {points_to_add} points for {activity_type}"
-        )
+        entries = [
+            PointsTransaction(
+                student=user,
+                activity_type=activity_type,
+                column=cls.get_points_column(activity_type),
+                points=points_override or cls.POINTS.get(activity_type, 0),
+                idempotency_key=idempotency_key
+            )
+            for activity_type, points_override, idempotency_key in awards
+        ]
         
-        # Check for new achievements
-        new_achievements = cls.check_achievements(user)
+        with transaction.atomic():
+            points_obj, created = StudentPoints.objects.select_for_update().get_or_create(
+                student=user,
+                defaults={'total_points': 0, 'level': 1, 'current_streak': 0, 'longest_streak': 0}
+            )
+            
+            keys = [entry.idempotency_key for entry in entries if entry.idempotency_key]
+            if keys:
+                applied = set(PointsTransaction.objects.filter(idempotency_key__in=keys)
+                              .values_list('idempotency_key', flat=True))
+                entries = [entry for entry in entries if entry.idempotency_key not in applied]
+            if not entries:
+                return {
+                    'points_awarded': 0,
+                    'total_points': points_obj.total_points,
+                    'level_up': False,
+                    'new_level': None,
+                    'new_achievements': [],
+                    'duplicate': True
+                }
+            points_to_add = sum(entry.points for entry in entries)
+            
+            # Streak bookkeeping happens on the first activity of each day;
+            # the ledger guarantees the bonus is granted at most once per day
+            today = date.today()
+            current_streak, is_new_day = StreakEngine.advance(
+                points_obj.last_activity_date, points_obj.current_streak, today
+            )
+            bonus_type = StreakEngine.bonus_type(current_streak)
+            bonus_points = cls.POINTS[bonus_type]
+            if is_new_day and StreakEngine.claim_bonus(user, today, bonus_type, bonus_points):
+                entries.append(PointsTransaction(
+                    student=user,
+                    activity_type=bonus_type,
+                    column='consistency_points',
+                    points=bonus_points
+                ))
+            
+            # Apply the entries one after another, exactly like a replay
+            columns = {}
+            total = F('total_points')
+            levels = []
+            for entry in entries:
+                columns[entry.column] = Greatest(columns.get(entry.column, F(entry.column)) + entry.points, 0)
+                total = Greatest(total + entry.points, 0)
+                levels.append(cls.level_expression(total))
+            StudentPoints.objects.filter(pk=points_obj.pk).update(
+                total_points=total,
+                level=Greatest(F('level'), *levels),
+                current_streak=current_streak,
+                longest_streak=Greatest(F('longest_streak'), current_streak),
+                last_activity_date=today,
+                **columns
+            )
+            updated = StudentPoints.objects.get(pk=points_obj.pk)
+            
+            PointsTransaction.objects.bulk_create(entries)
+            cls.record_daily_activity(user, today, sum(entry.points for entry in entries))
+            StudentActivity.objects.bulk_create([
+                StudentActivity(
+                    student=user,
+                    activity_type=entry.activity_type,
+                    description=f"Earned {entry.points} points for {entry.activity_type}"
+                )
+                for entry in entries
+            ])
+            PointsRankIndex.move(points_obj.total_points, updated.total_points)
+            Leaderboard.move(user.id, Leaderboard.scores(points_obj), Leaderboard.scores(updated))
+            invalidate_user_status(user.id)
+            
+            # Check for new achievements
+            new_achievements = cls.check_achievements(user, updated, previous=points_obj)
+            cls.update_progress(user, points_obj, updated)
         
+        level_up = updated.level > points_obj.level
         return {
             'points_awarded': points_to_add,
-            'total_points': points_obj.total_points,
+            'total_points': updated.total_points,
             'level_up': level_up,
-            'new_level': points_obj.level if level_up else None,
+            'new_level': updated.level if level_up else None,
             'new_achievements': new_achievements
         }
     
     @classmethod
-    def update_streak(cls, user):
-        """Update user's learning streak"""
-        points_obj = cls.get_or_create_points(user)
-        today = date.today()
-        
-        # Get or create today's streak record
-        streak, created = LearningStreak.objects.get_or_create(
-            student=user,
-            date=today,
-            defaults={'activities_count': 0, 'points_earned': 0}
+    def level_expression(cls, total_points):
+        """SQL version of StudentPoints.calculate_level for the given total expression"""
+        return Cast(
+            Sqrt(ExpressionWrapper(total_points / 100.0, output_field=FloatField())),
+            IntegerField()
+        ) + 1
+    
+    @classmethod
+    def record_daily_activity(cls, user, day, points):
+        """Count an activity in the user's LearningStreak row for ``day``"""
+        updated = LearningStreak.objects.filter(student=user, date=day).update(
+            activities_count=F('activities_count') + 1,
+            points_earned=F('points_earned') + points
         )
-        
-        streak.activities_count += 1
-        streak.save()
-        
-        # Check if streak continues from yesterday
-        yesterday = today - timedelta(days=1)
-        
-        if points_obj.last_activity_date == yesterday:
-            # Streak continues
-            points_obj.current_streak += 1 if created else 0
-        elif points_obj.last_activity_date != today:
-            # New streak or broken streak
-            points_obj.current_streak = 1
-        
-        # Update longest streak
-        if points_obj.current_streak > points_obj.longest_streak:
-            points_obj.longest_streak = points_obj.current_streak
-        
-        points_obj.last_activity_date = today
-        points_obj.save()
-        
-        # Award streak bonuses
-        if points_obj.current_streak % 7 == 0:  # Weekly streak
-            cls.award_points(user, 'weekly_streak')
-        elif points_obj.current_streak % 30 == 0:  # Monthly streak
-            cls.award_points(user, 'monthly_streak')
-        elif created:  # Daily activity
-            cls.award_points(user, 'daily_streak')
+        if not updated:
+            LearningStreak.objects.create(student=user, date=day, activities_count=1, points_earned=points)
     
     @classmethod
-    def check_achievements(cls, user):
-        """Check and award new achievements"""
-        points_obj = cls.get_or_create_points(user)
-        new_achievements = []
+    def check_achievements(cls, user, points_obj=None, previous=None):
+        """
+        Check and award new achievements.
         
-        # Get all available achievements
-        available_achievements = Achievement.objects.filter(is_active=True)
+        With ``previous`` (the row before an award) only the rules whose
+        thresholds were crossed are evaluated; otherwise every rule is.
+        """
+        if points_obj is None:
+            points_obj = cls.get_or_create_points(user)
+        
+        index = get_rule_index()
+        if previous is not None:
+            rules = index.crossed(metric_values(previous), metric_values(points_obj))
+        else:
+            rules = index.met(metric_values(points_obj))
+        if not rules:
+            return []
         
         # Get user's current achievements
-        earned_achievement_ids = StudentAchievement.objects.filter(
-            student=user
-        ).values_list('achievement_id', flat=True)
+        earned_achievement_ids = set(StudentAchievement.objects.filter(
+            student=user,
+            achievement_id__in=[rule.achievement.id for rule in rules]
+        ).values_list('achievement_id', flat=True))
         
-        for achievement in available_achievements:
-            if achievement.id in earned_achievement_ids:
+        new_achievements = []
+        for rule in rules:
+            if rule.achievement.id in earned_achievement_ids:
                 continue  # Already earned
-            
-            # Check if user qualifies for this achievement
-            if cls.qualifies_for_achievement(user, achievement, points_obj):
-                # Award achievement
-                StudentAchievement.objects.create(
-                    student=user,
-                    achievement=achievement
-                )
-                new_achievements.append(achievement)
+            StudentAchievement.objects.create(
+                student=user,
+                achievement=rule.achievement
+            )
+            earned_achievement_ids.add(rule.achievement.id)
+            new_achievements.append(rule.achievement)
         
         return new_achievements
     
+    @classmethod
+    def update_progress(cls, user, previous, points_obj):
+        """
+        Upsert the progress rows of the rules that ``previous`` had not met,
+        on the metrics that changed; every other row is left untouched
+        """
+        before, after = metric_values(previous), metric_values(points_obj)
+        rules = get_rule_index().pending(before, after)
+        if rules:
+            AchievementProgress.objects.bulk_create(
+                [
+                    AchievementProgress(
+                        student=user,
+                        achievement=rule.achievement,
+                        value=min(after[rule.metric], rule.threshold),
+                        target=rule.threshold
+                    )
+                    for rule in rules
+                ],
+                update_conflicts=True,
+                unique_fields=['student', 'achievement'],
+                update_fields=['value', 'target', 'updated_at']
+            )
+    
+    @classmethod
+    def get_achievement_progress(cls, user):
+        """Achievements the user has started but not earned, closest first"""
+        earned = StudentAchievement.objects.filter(student=OuterRef('student'), achievement=OuterRef('achievement'))
+        progress = (
+            AchievementProgress.objects.filter(
+                student=user, value__gt=0, value__lt=F('target'), achievement__is_active=True
+            )
+            .exclude(Exists(earned))
+            .select_related('achievement')
+        )
+        return sorted(progress, key=lambda row: row.percentage, reverse=True)
+    
     @classmethod
     def qualifies_for_achievement(cls, user, achievement, points_obj):
         """Check if user qualifies for specific achievement"""
-        
-        # Points-based achievements
-        if achievement.points_required > 0:
-            category_points = {
-                'questions': points_obj.questions_points,
-                'answers': points_obj.answers_points,
-                'helping': points_obj.helping_points,
-                'consistency': points_obj.consistency_points,
-            }
-            
-            required_points = achievement.points_required
-            if achievement.category in category_points:
-                return category_points[achievement.category] >= required_points
-            else:
-                return points_obj.total_points >= required_points
-        
-        # Special achievement logic
-        achievement_name = achievement.name.lower()
-        
-        if 'first question' in achievement_name:
-            return points_obj.questions_points > 0
-        elif 'first answer' in achievement_name:
-            return points_obj.answers_points > 0
-        elif 'streak' in achievement_name:
-            if '7 day' in achievement_name:
-                return points_obj.current_streak >= 7
-            elif '30 day' in achievement_name:
-                return points_obj.current_streak >= 30
-        elif 'level' in achievement_name:
-            if 'level 5' in achievement_name:
-                return points_obj.level >= 5
-            elif 'level 10' in achievement_name:
-                return points_obj.level >= 10
-        
-        return False
+        rule = compile_rule(achievement)
+        return rule is not None and metric_values(points_obj)[rule.metric] >= rule.threshold
     
     @classmethod
     def get_leaderboard(cls, limit=10, category='total'):
-        """Get leaderboard for points"""
-        order_field = {
-            'total': '-total_points',
-            'questions': '-questions_points',
-            'answers': '-answers_points',
-            'level': '-level',
-            'streak': '-current_streak'
-        }.get(category, '-total_points')
-        
-        return StudentPoints.objects.select_related('student').order_by(order_field)[:limit]
+        """Get leaderboard for points (staff excluded), read from the materialized board"""
+        return Leaderboard.top(category, limit)
     
     @classmethod
     def get_user_stats(cls, user):
@@ -229,6 +310,7 @@ class GamificationManager:
             'points': points_obj,
             'achievements': achievements,
             'achievements_count': achievements.count(),
+            'achievement_progress': cls.get_achievement_progress(user),
             'rank': cls.get_user_rank(user),
             'progress_to_next_level': cls.get_level_progress(points_obj)
         }
@@ -237,10 +319,13 @@ class GamificationManager:
     def get_user_rank(cls, user):
         """Get user's rank based on total points"""
         points_obj = cls.get_or_create_points(user)
-        higher_ranked = StudentPoints.objects.filter(
-            total_points__gt=points_obj.total_points
-        ).count()
-        return higher_ranked + 1
+        return PointsRankIndex.rank(points_obj.total_points)
+    
+    @classmethod
+    def get_user_percentile(cls, user):
+        """Get the share of students with fewer points than the user"""
+        points_obj = cls.get_or_create_points(user)
+        return PointsRankIndex.percentile(points_obj.total_points)
     
     @classmethod
     def get_level_progress(cls, points_obj):
@@ -262,76 +347,64 @@ class GamificationManager:
 
 # Initialize default achievements
 def create_default_achievements():
-    """Create default achievements for the platform"""
-    default_achievements = [
-        {
-            'name': 'First Question',
-            'description': 'Asked your first question',
-            'icon': 'fas fa-question-circle',
-            'points_required': 0,
-            'category': 'questions',
-            'color': 'bronze'
-        },
-        {
-            'name': 'First Answer',
-            'description': 'Provided your first answer',
-            'icon': 'fas fa-comment',
-            'points_required': 0,
-            'category': 'answers',
-            'color': 'bronze'
-        },
-        {
-            'name': 'Curious Mind',
-            'description': 'Asked 10 questions',
-            'icon': 'fas fa-brain',
-            'points_required': 50,
-            'category': 'questions',
-            'color': 'silver'
-        },
-        {
-            'name': 'Helper',
-            'description': 'Provided 10 helpful answers',
-            'icon': 'fas fa-hands-helping',
-            'points_required': 100,
-            'category': 'answers',
-            'color': 'silver'
-        },
-        {
-            'name': 'Consistent Learner',
-            'description': 'Maintained a 7-day learning streak',
-            'icon': 'fas fa-fire',
-            'points_required': 35,
-            'category': 'consistency',
-            'color': 'gold'
-        },
-        {
-            'name': 'Expert',
-            'description': 'Reached Level 5',
-            'icon': 'fas fa-star',
-            'points_required': 2500,
-            'category': 'expertise',
-            'color': 'gold'
-        },
-        {
-            'name': 'Master',
-            'description': 'Reached Level 10',
-            'icon': 'fas fa-crown',
-            'points_required': 10000,
-            'category': 'expertise',
-            'color': 'platinum'
-        },
-        {
-            'name': 'Community Builder',
-            'description': 'Helped 50 students with answers',
-            'icon': 'fas fa-users',
-            'points_required': 500,
-            'category': 'community',
-            'color': 'gold'
-        }
-    ]
-    
-    for achievement_data in default_achievements:
+    """Create the default achievements that are missing (migration 0015 seeds them)"""
+    for achievement_data in DEFAULT_ACHIEVEMENTS:
         Achievement.objects.get_or_create(
             name=achievement_data['name'],
             defaults=achievement_data
         )
+
+
+def provision_missing_rows(users, batch_size=1000, progress=None):
+    """
+    Create the UserProfile and StudentPoints rows missing for ``users``.
+    
+    Users are walked in id order, one chunk at a time: each chunk costs a
+    few set-difference reads and bulk inserts in its own short transaction,
+    so the write lock is released between chunks. The rank index and the
+    leaderboard are updated in bulk for the new points rows (bulk_create
+    skips their signals). ``progress(done, profiles, points)`` is called
+    after every chunk. Returns (users seen, profiles created, points created).
+    """
+    seen = profiles_created = points_created = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            users.filter(id__gt=last_id).order_by('id').values_list('id', 'is_staff')[:batch_size]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        ids = [user_id for user_id, is_staff in chunk]
+        
+        with transaction.atomic():
+            has_profile = set(UserProfile.objects.filter(user_id__in=ids).values_list('user_id', flat=True))
+            has_points = set(StudentPoints.objects.filter(student_id__in=ids).values_list('student_id', flat=True))
+            
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id in ids if user_id not in has_profile],
+                batch_size=batch_size
+            )
+            new_points = [user_id for user_id in ids if user_id not in has_points]
+            fresh_points = StudentPoints(total_points=0, level=1, current_streak=0, longest_streak=0)
+            StudentPoints.objects.bulk_create(
+                [
+                    StudentPoints(student_id=user_id, total_points=0, level=1, current_streak=0, longest_streak=0)
+                    for user_id in new_points
+                ],
+                batch_size=batch_size
+            )
+            if new_points:
+                PointsRankIndex.adjust(fresh_points.total_points, len(new_points))
+                Leaderboard.add_many(
+                    [user_id for user_id, is_staff in chunk if not is_staff and user_id not in has_points],
+                    Leaderboard.scores(fresh_points)
+                )
+        
+        seen += len(ids)
+        profiles_created += len(ids) - len(has_profile)
+        points_created += len(new_points)
+        if progress:
+            progress(seen, profiles_created, points_created)
+    
+    return seen, profiles_created, points_created
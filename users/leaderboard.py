@@ -0,0 +1,358 @@
+"""
+Materialized leaderboard for AskUP
+One LeaderboardEntry per (category, student) holds the student's score, so a
+leaderboard page is an indexed range read on (category, -score, student)
+instead of a sort over every StudentPoints row. Staff are never ranked.
+
+Ranks are dense and computed at read time. Each category keeps a Fenwick tree
+over its distinct scores (see users/ranking.py), so a score's rank is
+1 + the number of distinct scores above it, read from ~23 nodes in one query.
+A second tree per category counts students per score and serves percentiles
+the same way. When a student's score moves from ``old`` to ``new`` the
+students tree moves one count and the distinct-score tree only changes if
+``old`` disappears as a distinct score or ``new`` appears as one; both are
+applied with a single UPDATE of at most ~92 nodes, however many students
+share the board. Pages rank their rows by walking down from the first row's
+rank.
+
+Weekly, monthly and term boards are summed from the daily LearningStreak
+rollups, so they read at most one row per student per day of the window.
+"""
+
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from .models import LeaderboardEntry, LeaderboardNode, LearningStreak, StudentPoints
+from .ranking import FenwickTree, update_trees
+
+# Leaderboard category -> StudentPoints column
+CATEGORIES = {
+    'total': 'total_points',
+    'questions': 'questions_points',
+    'answers': 'answers_points',
+    'level': 'level',
+    'streak': 'current_streak',
+}
+
+# Time windows; 'all' is the materialized all-time board
+WINDOWS = [
+    ('all', 'All Time'),
+    ('week', 'Last 7 Days'),
+    ('month', 'Last 30 Days'),
+    ('term', 'This Term'),
+]
+
+# Largest number of neighbours served on each side of an "around me" window
+MAX_WINDOW = 25
+
+
+def term_start(today):
+    """First day of the current term (settings.LEADERBOARD_TERM_START or Jan 1 / Aug 1)"""
+    configured = settings.LEADERBOARD_TERM_START
+    if configured:
+        start = date.fromisoformat(str(configured))
+        if start <= today:
+            return start
+    return date(today.year, 8 if today.month >= 8 else 1, 1)
+
+
+def window_start(window, today):
+    if window == 'week':
+        return today - timedelta(days=6)
+    if window == 'month':
+        return today - timedelta(days=29)
+    return term_start(today)
+
+
+class WindowedEntry(namedtuple('WindowedEntry', ['student', 'score', 'rank'])):
+    """A row of a time-windowed board; ``score`` is the points earned in the window"""
+
+    @property
+    def level(self):
+        return self.student.points.level
+
+    @property
+    def total_points(self):
+        return self.student.points.total_points
+
+
+class Leaderboard:
+    """Incremental maintenance and reads of the materialized leaderboard"""
+
+    @classmethod
+    def scores(cls, points_obj):
+        """Category scores of a StudentPoints row, without loading deferred fields"""
+        values = points_obj.__dict__
+        return {category: values.get(field) or 0 for category, field in CATEGORIES.items()}
+
+    @classmethod
+    def _others(cls, category, student_id):
+        return LeaderboardEntry.objects.filter(category=category).exclude(student_id=student_id)
+
+    @classmethod
+    def _distinct_scores(cls, category):
+        """The category's Fenwick tree counting each distinct score once"""
+        return FenwickTree(LeaderboardNode, 'count', category=category, tree='scores')
+
+    @classmethod
+    def _students(cls, category):
+        """The category's Fenwick tree counting ranked students per score"""
+        return FenwickTree(LeaderboardNode, 'count', category=category, tree='students')
+
+    @classmethod
+    def _taken(cls, category, student_id, *scores):
+        """Which of ``scores`` are held by someone else"""
+        return set(
+            cls._others(category, student_id).filter(score__in=scores)
+            .values_list('score', flat=True).distinct()
+        )
+
+    @classmethod
+    def add(cls, student_id, scores):
+        """Put a student on the board for each of ``scores``' categories"""
+        present = set(
+            LeaderboardEntry.objects.filter(student_id=student_id).values_list('category', flat=True)
+        )
+        rows = []
+        changes = []
+        for category, score in scores.items():
+            if category in present:
+                continue
+            if score not in cls._taken(category, student_id, score):
+                changes.append((cls._distinct_scores(category), score, 1))
+            changes.append((cls._students(category), score, 1))
+            rows.append(LeaderboardEntry(category=category, student_id=student_id, score=score))
+        update_trees(changes)
+        LeaderboardEntry.objects.bulk_create(rows)
+
+    @classmethod
+    def add_many(cls, student_ids, scores):
+        """
+        Put several students who share the same ``scores`` (e.g. freshly
+        created points rows) on the board with one bulk insert
+        """
+        if not student_ids:
+            return
+        rows = []
+        changes = []
+        for category, score in scores.items():
+            if not LeaderboardEntry.objects.filter(category=category, score=score).exists():
+                changes.append((cls._distinct_scores(category), score, 1))
+            changes.append((cls._students(category), score, len(student_ids)))
+            rows.extend(
+                LeaderboardEntry(category=category, student_id=student_id, score=score)
+                for student_id in student_ids
+            )
+        update_trees(changes)
+        LeaderboardEntry.objects.bulk_create(rows, batch_size=1000)
+
+    @classmethod
+    def remove(cls, student_id):
+        """Take a student off every category"""
+        entries = list(LeaderboardEntry.objects.filter(student_id=student_id))
+        changes = []
+        for entry in entries:
+            if entry.score not in cls._taken(entry.category, student_id, entry.score):
+                changes.append((cls._distinct_scores(entry.category), entry.score, -1))
+            changes.append((cls._students(entry.category), entry.score, -1))
+        update_trees(changes)
+        LeaderboardEntry.objects.filter(student_id=student_id).delete()
+
+    @classmethod
+    def move(cls, student_id, old_scores, new_scores):
+        """
+        Apply a student's score changes. Categories that did not change cost
+        nothing, and students who are not on the board (staff) are skipped.
+        """
+        changed = {
+            category: new for category, new in new_scores.items()
+            if new != old_scores.get(category, 0)
+        }
+        if not changed:
+            return
+        ranked = set(
+            LeaderboardEntry.objects.filter(student_id=student_id).values_list('category', flat=True)
+        )
+        if not ranked:
+            return
+
+        for category, new in changed.items():
+            if category not in ranked:
+                cls.add(student_id, {category: new})
+                continue
+            old = old_scores.get(category, 0)
+            taken = cls._taken(category, student_id, old, new)
+            distinct, students = cls._distinct_scores(category), cls._students(category)
+            changes = [(students, old, -1), (students, new, 1)]
+            if old not in taken:
+                changes.append((distinct, old, -1))
+            if new not in taken:
+                changes.append((distinct, new, 1))
+            update_trees(changes)
+            LeaderboardEntry.objects.filter(category=category, student_id=student_id).update(score=new)
+
+    @classmethod
+    def _rank_of(cls, category, score):
+        """Dense rank of ``score``: 1 + the number of distinct scores above it"""
+        at_most = list(FenwickTree.query_path(FenwickTree.position(score)))
+        counts = dict(
+            LeaderboardNode.objects.filter(
+                category=category, tree='scores', position__in=set(at_most + [FenwickTree.SIZE])
+            ).values_list('position', 'count')
+        )
+        return counts.get(FenwickTree.SIZE, 0) - sum(counts.get(p, 0) for p in at_most) + 1
+
+    @staticmethod
+    def _rank_down(entries, rank, score):
+        """
+        Rank ``entries`` (best first) that follow a row holding ``score`` at
+        ``rank``: each new score is the next dense rank
+        """
+        for entry in entries:
+            if entry.score != score:
+                rank += 1
+                score = entry.score
+            entry.rank = rank
+        return entries
+
+    @staticmethod
+    def _rank_up(entries, rank, score):
+        """Rank ``entries`` (worst first) that precede a row holding ``score`` at ``rank``"""
+        for entry in entries:
+            if entry.score != score:
+                rank -= 1
+                score = entry.score
+            entry.rank = rank
+        return entries
+
+    @classmethod
+    def top(cls, category='total', limit=10):
+        """Leaders of a category, best first, each with its dense ``rank``"""
+        if category not in CATEGORIES:
+            category = 'total'
+        leaders = list(
+            LeaderboardEntry.objects.filter(category=category)
+            .select_related('student__points')
+            .order_by('-score', 'student_id')[:limit]
+        )
+        if not leaders:
+            return leaders
+        first = leaders[0]
+        first.rank = cls._rank_of(category, first.score)
+        return [first] + cls._rank_down(leaders[1:], first.rank, first.score)
+
+    @classmethod
+    def rank(cls, student_id, category='total'):
+        """The student's dense rank in a category, or None if they are not on the board"""
+        if category not in CATEGORIES:
+            category = 'total'
+        score = (
+            LeaderboardEntry.objects.filter(category=category, student_id=student_id)
+            .values_list('score', flat=True).first()
+        )
+        return None if score is None else cls._rank_of(category, score)
+
+    @classmethod
+    def around(cls, student_id, category='total', size=5):
+        """
+        The student's entry plus up to ``size`` entries above (best first) and
+        below, each with its dense ``rank``, walked from the student's position
+        along the (category, -score, student) index. Returns (None, [], []) for
+        students not on the board.
+        """
+        if category not in CATEGORIES:
+            category = 'total'
+        entry = (
+            LeaderboardEntry.objects.filter(category=category, student_id=student_id)
+            .select_related('student__points').first()
+        )
+        if entry is None:
+            return None, [], []
+        entry.rank = cls._rank_of(category, entry.score)
+
+        board = LeaderboardEntry.objects.filter(category=category).select_related('student__points')
+        above = list(
+            board.filter(score__gte=entry.score)
+            .exclude(score=entry.score, student_id__gte=student_id)
+            .order_by('score', '-student_id')[:size]
+        )
+        below = list(
+            board.filter(score__lte=entry.score)
+            .exclude(score=entry.score, student_id__lte=student_id)
+            .order_by('-score', 'student_id')[:size]
+        )
+        cls._rank_up(above, entry.rank, entry.score)
+        cls._rank_down(below, entry.rank, entry.score)
+        return entry, above[::-1], below
+
+    @classmethod
+    def percentile(cls, entry):
+        """
+        Share of ranked students scoring below ``entry``, in percent, read
+        from the category's students tree in one query. Staff are left out
+        exactly as they are on the board.
+        """
+        below = list(FenwickTree.query_path(FenwickTree.position(entry.score) - 1))
+        counts = dict(
+            LeaderboardNode.objects.filter(
+                category=entry.category, tree='students', position__in=set(below + [FenwickTree.SIZE])
+            ).values_list('position', 'count')
+        )
+        total = counts.get(FenwickTree.SIZE, 0)
+        return (sum(counts.get(p, 0) for p in below) / total) * 100 if total else 0
+
+    @classmethod
+    def top_window(cls, window, limit=10, today=None):
+        """
+        Leaders by points earned in a time window, summed from the daily
+        LearningStreak rollups (at most one row per student per day)
+        """
+        today = today or date.today()
+        totals = list(
+            LearningStreak.objects.filter(
+                date__gte=window_start(window, today), date__lte=today, student__is_staff=False
+            )
+            .values('student_id')
+            .annotate(window_points=Sum('points_earned'))
+            .filter(window_points__gt=0)
+            .order_by('-window_points', 'student_id')
+            .values_list('student_id', 'window_points')[:limit]
+        )
+        students = User.objects.select_related('points').in_bulk([student_id for student_id, _ in totals])
+
+        leaders = []
+        rank = 0
+        previous = None
+        for student_id, score in totals:
+            if score != previous:
+                rank += 1
+                previous = score
+            leaders.append(WindowedEntry(students[student_id], score, rank))
+        return leaders
+
+    @classmethod
+    def build_entries(cls, category):
+        """Entries for one category computed from scratch"""
+        field = CATEGORIES[category]
+        rows = StudentPoints.objects.filter(student__is_staff=False).values_list('student_id', field)
+        return [
+            LeaderboardEntry(category=category, student_id=student_id, score=score or 0)
+            for student_id, score in rows
+        ]
+
+    @classmethod
+    def rebuild(cls, categories=None):
+        """Recompute the given categories (all by default); returns rows written"""
+        written = 0
+        for category in categories or CATEGORIES:
+            LeaderboardEntry.objects.filter(category=category).delete()
+            entries = cls.build_entries(category)
+            LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+            histogram = Counter(entry.score for entry in entries)
+            cls._distinct_scores(category).rebuild((score, 1) for score in histogram)
+            cls._students(category).rebuild(histogram.items())
+            written += len(entries)
+        return written
@@ -0,0 +1,40 @@
+"""
+Management command to award achievements to every student who already qualifies.
+
+Run it after adding or re-tuning an Achievement; students otherwise only get
+it the next time they earn points.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand
+from users.achievement_backfill import PARTITION_SIZE, backfill, partitions
+from users.models import Achievement
+
+
+class Command(BaseCommand):
+    help = 'Backfill StudentAchievement rows for new or changed achievements across all students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('achievements', nargs='*', type=int, help='Achievement ids (default: all active)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--partition-size', type=int, default=PARTITION_SIZE, help='Student ids per partition')
+
+    def handle(self, *args, **options):
+        achievements = Achievement.objects.filter(is_active=True)
+        if options['achievements']:
+            achievements = achievements.filter(id__in=options['achievements'])
+        achievements = list(achievements)
+        total = len(partitions(options['partition_size']))
+
+        self.stdout.write(
+            f'Backfilling {len(achievements)} achievements over {total} partitions '
+            f'with {options["workers"]} workers...'
+        )
+        created = backfill(
+            achievements,
+            workers=options['workers'],
+            partition_size=options['partition_size'],
+            progress=lambda done: self.stdout.write(f'  {done}/{total} partitions done')
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ Awarded {created} achievements'))
@@ -0,0 +1,70 @@
+"""
+Management command to recompute every student's streak from LearningStreak dates
+"""
+
+from datetime import date
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.leaderboard import Leaderboard
+from users.models import LearningStreak, StudentPoints
+from users.streaks import StreakEngine
+
+
+class Command(BaseCommand):
+    help = 'Recompute current/longest streak and last activity date for all students in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per UPDATE batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        today = date.today()
+        points_ids = dict(StudentPoints.objects.values_list('student_id', 'id'))
+
+        rows = (
+            LearningStreak.objects.order_by('student_id', 'date')
+            .values_list('student_id', 'date')
+            .iterator(chunk_size=batch_size)
+        )
+
+        pending = []
+        updated = 0
+        with transaction.atomic():
+            for student_id, student_rows in groupby(rows, key=itemgetter(0)):
+                if student_id not in points_ids:
+                    continue
+                current, longest, last_date = StreakEngine.summarize((day for _, day in student_rows), today)
+                pending.append(StudentPoints(
+                    id=points_ids[student_id],
+                    current_streak=current,
+                    longest_streak=longest,
+                    last_activity_date=last_date,
+                ))
+                if len(pending) >= batch_size:
+                    updated += self.flush(pending)
+
+            updated += self.flush(pending)
+
+            # Students without any recorded activity have no streak
+            reset = StudentPoints.objects.exclude(
+                student_id__in=LearningStreak.objects.values('student_id')
+            ).exclude(
+                current_streak=0, longest_streak=0, last_activity_date__isnull=True
+            ).update(current_streak=0, longest_streak=0, last_activity_date=None)
+
+            # bulk_update bypasses the leaderboard signals
+            Leaderboard.rebuild(['streak'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Streaks recomputed for {updated} students ({reset} reset)'))
+
+    def flush(self, pending):
+        count = len(pending)
+        if pending:
+            StudentPoints.objects.bulk_update(
+                pending, ['current_streak', 'longest_streak', 'last_activity_date']
+            )
+            pending.clear()
+        return count
@@ -0,0 +1,60 @@
+"""
+Management command to benchmark GamificationManager.award_points.
+
+Creates throwaway students inside a transaction, awards points repeatedly,
+reports queries per award and latency percentiles, then rolls everything back.
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from users.gamification import GamificationManager, create_default_achievements
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data once it is done"""
+
+
+class Command(BaseCommand):
+    help = 'Measure queries per award and award_points latency (p50/p95)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20, help='Number of throwaway students')
+        parser.add_argument('--awards', type=int, default=500, help='Total number of awards to time')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['students'], options['awards'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('✓ Benchmark data rolled back'))
+
+    def run(self, student_count, award_count):
+        create_default_achievements()
+        tag = f'award_bench{int(time.time())}'
+        students = [User.objects.create_user(username=f'{tag}_{i}') for i in range(student_count)]
+        activities = ['question_asked', 'answer_given', 'helpful_answer']
+
+        timings = []
+        query_counts = []
+        for i in range(award_count):
+            student = students[i % student_count]
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                GamificationManager.award_points(student, activities[i % len(activities)])
+                timings.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(queries))
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+        self.stdout.write(f'Awards timed:        {award_count}')
+        self.stdout.write(f'Queries per award:   {statistics.mean(query_counts):.1f} avg, {max(query_counts)} max')
+        self.stdout.write(f'Latency p50:         {statistics.median(timings):.2f} ms')
+        self.stdout.write(f'Latency p95:         {p95:.2f} ms')
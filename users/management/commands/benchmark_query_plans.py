@@ -0,0 +1,197 @@
+"""
+Management command to benchmark the hot view queries against seeded data.
+
+Seeds a synthetic dataset inside a transaction, runs each view's query with
+EXPLAIN QUERY PLAN, reports whether it full-scans or uses an index together
+with timings, then rolls everything back.
+"""
+
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from qna.models import Question, Answer, AdminQuestionRecord
+from qna.views import get_feed_queryset
+from qna.feed import FEED_PAGE_SIZE
+from users.models import Notification, Message, Conversation, ConversationMessage, ConversationReadCursor
+from users.read_cursors import conversation_list
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded data once the benchmark is done"""
+
+
+def classify_plan(plan):
+    """Summarise an SQLite query plan as 'full scan', 'index' or 'index + sort'"""
+    full_scan = any(
+        'SCAN ' in line and 'USING' not in line and 'CONSTANT ROW' not in line
+        for line in plan.splitlines()
+    )
+    if full_scan:
+        return 'full scan'
+    if 'TEMP B-TREE' in plan:
+        return 'index + sort'
+    return 'index'
+
+
+class Command(BaseCommand):
+    help = 'Seed data, EXPLAIN QUERY PLAN the hot view queries and report index usage and timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Number of students to seed')
+        parser.add_argument('--questions', type=int, default=20000, help='Number of questions to seed')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--show-plans', action='store_true', help='Print the full query plan for each query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark reads SQLite EXPLAIN QUERY PLAN output.')
+
+        try:
+            with transaction.atomic():
+                self.seed(options['users'], options['questions'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                self.report(options['repeat'], options['show_plans'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\n✓ Seeded data rolled back'))
+
+    def seed(self, user_count, question_count):
+        self.stdout.write(f'Seeding {user_count} students and {question_count} questions...')
+        rng = random.Random(42)
+        now = timezone.now()
+        batch = 1000
+
+        tag = f'bench{int(time.time())}'
+        User.objects.bulk_create(
+            [User(username=f'{tag}_student_{i}') for i in range(user_count)]
+            + [User(username=f'{tag}_admin_{i}', is_staff=True) for i in range(5)],
+            batch_size=batch,
+        )
+        students = list(User.objects.filter(username__startswith=f'{tag}_student_'))
+        admins = list(User.objects.filter(username__startswith=f'{tag}_admin_'))
+        self.student, self.admin = students[0], admins[0]
+
+        statuses = [choice for choice, _ in Question.STATUS_CHOICES]
+        categories = [choice for choice, _ in Question.CATEGORY_CHOICES]
+        questions = []
+        for i in range(question_count):
+            status = rng.choice(statuses)
+            questions.append(Question(
+                title=f'Benchmark question {i}',
+                details='Seeded question body',
+                category=rng.choice(categories),
+                author=rng.choice(students),
+                assigned_admin=rng.choice(admins) if status != 'open' else None,
+                status=status,
+                is_private=rng.random() < 0.1,
+            ))
+        Question.objects.bulk_create(questions, batch_size=batch)
+        # auto_now_add ignores explicit values, so spread created_at afterwards
+        for question in questions:
+            question.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        Question.objects.bulk_update(questions, ['created_at'], batch_size=batch)
+
+        Answer.objects.bulk_create(
+            [Answer(question=rng.choice(questions), content='Seeded answer', author=rng.choice(students))
+             for _ in range(question_count)],
+            batch_size=batch,
+        )
+        AdminQuestionRecord.objects.bulk_create(
+            [AdminQuestionRecord(admin=q.assigned_admin or rng.choice(admins), question=q, student=q.author,
+                                 answered_at=now if q.status == 'answered' else None)
+             for q in questions if q.status != 'open'],
+            batch_size=batch, ignore_conflicts=True,
+        )
+        Notification.objects.bulk_create(
+            [Notification(user=rng.choice(students), title='Seeded', message='Seeded notification',
+                          notification_type='system_update', is_read=rng.random() < 0.8)
+             for _ in range(question_count * 2)],
+            batch_size=batch,
+        )
+        Message.objects.bulk_create(
+            [Message(sender=rng.choice(students), recipient=rng.choice(students + admins),
+                     subject='Seeded', content='Seeded message', is_read=rng.random() < 0.7)
+             for _ in range(question_count // 2)],
+            batch_size=batch,
+        )
+        conversations = []
+        for i in range(50):
+            conversation = Conversation.objects.create(title=f'Benchmark conversation {i}', created_by=self.student)
+            conversation.participants.add(self.student, rng.choice(admins))
+            conversations.append(conversation)
+        ConversationMessage.objects.bulk_create(
+            [ConversationMessage(conversation=rng.choice(conversations), sender=rng.choice([self.student, self.admin]),
+                                 content='Seeded chat')
+             for _ in range(question_count // 2)],
+            batch_size=batch,
+        )
+        self.conversation = conversations[0]
+        # The student has read the first 90% of the conversation
+        message_ids = list(self.conversation.messages.order_by('id').values_list('id', flat=True))
+        self.cursor = ConversationReadCursor.objects.get(conversation=self.conversation, user=self.student)
+        self.cursor.last_read_id = message_ids[len(message_ids) * 9 // 10] if message_ids else 0
+        self.cursor.save(update_fields=['last_read_id'])
+
+    def get_cases(self):
+        student, admin, conversation = self.student, self.admin, self.conversation
+        return [
+            ('home feed (student)',
+             get_feed_queryset(student).order_by('-created_at', '-id')[:FEED_PAGE_SIZE + 1]),
+            ('home feed (staff)',
+             get_feed_queryset(admin).order_by('-created_at', '-id')[:FEED_PAGE_SIZE + 1]),
+            ('question queue (open)',
+             Question.objects.filter(status='open', is_private=False).order_by('-created_at')[:50]),
+            ('my assigned questions',
+             Question.objects.filter(assigned_admin=admin, status='assigned')),
+            ('unread notifications',
+             Notification.objects.filter(user=student, is_read=False)),
+            ('recent notifications',
+             Notification.objects.filter(user=student).order_by('-created_at')[:5]),
+            ('unread messages',
+             Message.objects.filter(recipient=student, is_read=False)),
+            ('conversation unread',
+             ConversationMessage.objects.filter(conversation=conversation, id__gt=self.cursor.last_read_id)
+             .exclude(sender=student)),
+            ('conversation list',
+             conversation_list(student)),
+            ('admin answered records',
+             AdminQuestionRecord.objects.filter(admin=admin, answered_at__isnull=False)),
+        ]
+
+    def report(self, repeat, show_plans):
+        self.stdout.write('')
+        self.stdout.write(f'{"query":<26} {"plan":<14} {"median ms":>10} {"p95 ms":>10}')
+        self.stdout.write('-' * 64)
+
+        full_scans = 0
+        for label, queryset in self.get_cases():
+            plan = queryset.explain()
+            verdict = classify_plan(plan)
+            full_scans += verdict == 'full scan'
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            style = self.style.ERROR if verdict == 'full scan' else self.style.SUCCESS
+            self.stdout.write(
+                f'{label:<26} {style(f"{verdict:<14}")} {statistics.median(timings):>10.2f} {p95:>10.2f}'
+            )
+            if show_plans:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        self.stdout.write('-' * 64)
+        self.stdout.write(f'{full_scans} of {len(self.get_cases())} queries full-scan a table')
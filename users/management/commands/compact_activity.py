@@ -0,0 +1,28 @@
+"""
+Management command that folds old StudentActivity rows into daily rollups.
+
+Rows are deleted in bounded batches, each in its own transaction, so the job
+can be interrupted and rerun at any time.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from users.activity_log import BATCH_SIZE, compact, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Fold StudentActivity rows older than the retention window into daily rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_RETENTION_DAYS,
+                            help='Days of raw activity to keep')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows folded per transaction')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Compacting activity before {retention_cutoff(options["days"]):%Y-%m-%d}...')
+        folded = compact(
+            options['days'],
+            options['batch_size'],
+            progress=lambda done: self.stdout.write(f'  {done} rows folded')
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ Folded {folded} activity rows into daily rollups'))
@@ -4,37 +4,36 @@ Management command to create missing UserProfiles for existing users
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from users.models import UserProfile
-from users.gamification import GamificationManager
+from users.gamification import provision_missing_rows
 
 
 class Command(BaseCommand):
     help = 'Create missing UserProfiles for existing users and initialize gamification'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users handled per chunk (default: 1000)',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Fixing missing UserProfiles...')
         
-        created_count = 0
-        fixed_count = 0
-        
-        for user in User.objects.all():
-            try:
-                # Try to access the profile
-                profile = user.userprofile
-                # If we get here, profile exists, just ensure gamification is initialized
-                GamificationManager.get_or_create_points(user)
-                fixed_count += 1
-            except UserProfile.DoesNotExist:
-                # Create the missing profile
-                UserProfile.objects.create(user=user)
-                GamificationManager.get_or_create_points(user)
-                created_count += 1
-                self.stdout.write(f'Created UserProfile for: {user.username}')
+        total = User.objects.count()
+        processed, created_count, points_created = provision_missing_rows(
+            User.objects.all(),
+            batch_size=options['batch_size'],
+            progress=lambda done, profiles, points: self.stdout.write(
+                f'  {done}/{total} users checked ({profiles} profiles created)'
+            )
+        )
         
         self.stdout.write(
             self.style.SUCCESS(
                 f'✓ Created {created_count} new UserProfiles\n'
-                f'✓ Fixed {fixed_count} existing users\n'
-                f'✓ Total users processed: {created_count + fixed_count}'
+                f'✓ Initialized points for {points_created} users\n'
+                f'✓ Total users processed: {processed}'
             )
         )
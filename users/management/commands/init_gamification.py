@@ -5,8 +5,7 @@ Run this after migrations to set up default achievements and user points
 
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from users.gamification import GamificationManager, create_default_achievements
-from users.models import UserProfile
+from users.gamification import create_default_achievements, provision_missing_rows
 
 
 class Command(BaseCommand):
@@ -18,6 +17,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Reset all gamification data (WARNING: This will delete all points and achievements)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users handled per chunk (default: 1000)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write('Initializing AskUP Gamification System...')
@@ -31,19 +36,22 @@ class Command(BaseCommand):
         create_default_achievements()
         self.stdout.write(self.style.SUCCESS('✓ Default achievements created'))
         
-        # Initialize points for all existing users
+        # Initialize points for all existing users, in chunks
         self.stdout.write('Initializing user points...')
-        users_count = 0
-        for user in User.objects.all():
-            if not user.is_superuser:  # Skip superusers
-                # Create UserProfile if it doesn't exist
-                profile, created = UserProfile.objects.get_or_create(user=user)
-                
-                # Initialize gamification
-                GamificationManager.get_or_create_points(user)
-                users_count += 1
+        users = User.objects.filter(is_superuser=False)  # Skip superusers
+        total = users.count()
+        users_count, profiles_count, points_created = provision_missing_rows(
+            users,
+            batch_size=options['batch_size'],
+            progress=lambda done, profiles, points: self.stdout.write(
+                f'  {done}/{total} users checked ({profiles} profiles, {points} points rows created)'
+            )
+        )
         
-        self.stdout.write(self.style.SUCCESS(f'✓ Initialized points for {users_count} users'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Initialized points for {users_count} users '
+            f'({profiles_count} profiles and {points_created} points rows created)'
+        ))
         
         # Display summary
         from users.models import Achievement, StudentPoints
@@ -0,0 +1,40 @@
+"""
+Management command that drains the gamification/notification outbox.
+
+Safe to stop and restart at any time: events are only marked processed in
+the same transaction that applies them.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from users.outbox import BATCH_SIZE, pending_events, process_batch
+
+
+class Command(BaseCommand):
+    help = 'Apply queued gamification and notification side effects in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Events claimed per batch')
+        parser.add_argument('--once', action='store_true', help='Drain the pending events and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        total = failed_total = 0
+        try:
+            while True:
+                processed, failed = process_batch(options['batch_size'])
+                total += processed
+                failed_total += failed
+                if processed or failed:
+                    self.stdout.write(f'Processed {processed} events ({failed} failed)')
+                if processed + failed < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Outbox drained: {total} processed, {failed_total} failed, {pending_events().count()} pending'
+        ))
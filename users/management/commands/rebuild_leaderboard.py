@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the materialized leaderboard from StudentPoints
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.leaderboard import CATEGORIES, Leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute leaderboard entries and rank trees for every category (staff excluded)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('categories', nargs='*', choices=list(CATEGORIES), help='Categories to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        categories = options['categories'] or list(CATEGORIES)
+        self.stdout.write(f'Rebuilding leaderboard ({", ".join(categories)})...')
+        with transaction.atomic():
+            rows = Leaderboard.rebuild(categories)
+        self.stdout.write(self.style.SUCCESS(f'✓ Leaderboard rebuilt ({rows} entries)'))
@@ -0,0 +1,17 @@
+"""
+Management command to rebuild the points rank index from StudentPoints
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.ranking import PointsRankIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Fenwick tree that backs rank and percentile lookups'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding rank index...')
+        with transaction.atomic():
+            nodes = PointsRankIndex.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rank index rebuilt ({nodes} nodes)'))
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild StudentPoints from the points ledger
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.leaderboard import Leaderboard
+from users.points_ledger import replay
+from users.ranking import PointsRankIndex
+
+
+class Command(BaseCommand):
+    help = 'Recompute every StudentPoints projection by replaying the PointsTransaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows streamed and written per batch')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Replaying points ledger...')
+        with transaction.atomic():
+            written = replay(
+                batch_size=options['batch_size'],
+                progress=lambda done: self.stdout.write(f'  {done} students replayed')
+            )
+            # bulk_update bypasses the signals that keep these in step
+            PointsRankIndex.rebuild()
+            Leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'✓ Replayed the ledger into {written} StudentPoints rows'))
@@ -0,0 +1,58 @@
+"""
+Keyset pagination for conversation history.
+
+Message ids only grow, so a conversation's history is read by id ranges on the
+(conversation, id) index: the newest page is the first rows of a descending
+scan, older history continues below a ``before`` id and polling picks up above
+an ``after`` id. No page needs a COUNT or an OFFSET, so opening or polling a
+conversation costs the same whether it holds fifty messages or a hundred
+thousand.
+"""
+
+MESSAGE_PAGE_SIZE = 50
+
+
+def parse_message_id(value):
+    """Return a positive message id from a request parameter, or None"""
+    try:
+        message_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return message_id if message_id > 0 else None
+
+
+def messages_before(conversation, before=None, page_size=MESSAGE_PAGE_SIZE):
+    """
+    Return (messages, older_cursor) for the newest page of messages below
+    ``before`` (the newest in the conversation when None), oldest first.
+
+    ``older_cursor`` is the id to pass as ``before`` for the previous page, or
+    None when the start of the conversation has been reached.
+    """
+    queryset = conversation.messages.select_related('sender').order_by('-id')
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+
+    # Fetch one extra row to find out whether older history exists
+    page = list(queryset[:page_size + 1])
+    older_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        older_cursor = page[-1].id
+    page.reverse()
+    return page, older_cursor
+
+
+def messages_after(conversation, after=None, page_size=MESSAGE_PAGE_SIZE):
+    """
+    Return (messages, has_more) for up to ``page_size`` messages above
+    ``after``, oldest first; ``has_more`` means the caller should ask again
+    from the last id returned.
+    """
+    queryset = conversation.messages.select_related('sender').order_by('id')
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+
+    page = list(queryset[:page_size + 1])
+    has_more = len(page) > page_size
+    return page[:page_size], has_more
@@ -7,12 +7,12 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, Count, Max
-from django.utils import timezone
-from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 
-from .models import Conversation, ConversationMessage, MessageReadStatus, Notification
+from .models import Conversation, ConversationMessage, Notification
+from .message_history import messages_after, messages_before, parse_message_id
+from .read_cursors import conversation_list, mark_read
+from .user_search import find_recipients, recent_contacts
 from .forms import MessageForm
 from qna.models import Question
 
@@ -21,22 +21,11 @@ from qna.models import Question
 def messenger_home(request):
     """Main messenger interface showing all conversations"""
     # Get user's conversations
-    conversations = Conversation.objects.filter(
-        participants=request.user,
-        is_active=True
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(messages__is_read=False) & ~Q(messages__sender=request.user))
-    ).order_by('-last_message_time')
-    
-    # Get other students for starting new conversations
-    other_students = User.objects.filter(
-        is_active=True
-    ).exclude(id=request.user.id).order_by('first_name', 'username')
+    conversations = conversation_list(request.user)
     
+    # Recipients for new conversations are picked with search_users
     context = {
         'conversations': conversations,
-        'other_students': other_students,
         'active_conversation': None
     }
     
@@ -52,25 +41,12 @@ def conversation_detail(request, conversation_id):
         participants=request.user
     )
     
-    # Mark messages as read
-    unread_messages = conversation.messages.filter(
-        is_read=False
-    ).exclude(sender=request.user)
-    
-    for message in unread_messages:
-        message.is_read = True
-        message.save()
-        # Create read status
-        MessageReadStatus.objects.get_or_create(
-            message=message,
-            user=request.user
-        )
+    # Mark messages as read by moving the user's read cursor
+    mark_read(conversation, request.user)
     
-    # Get messages with pagination
-    messages_list = conversation.messages.all().select_related('sender')
-    paginator = Paginator(messages_list, 50)
-    page_number = request.GET.get('page', paginator.num_pages)  # Start from last page
-    page_messages = paginator.get_page(page_number)
+    # Newest page of messages, or the page below ?before= for older history
+    before = parse_message_id(request.GET.get('before'))
+    page_messages, older_cursor = messages_before(conversation, before)
     
     # Handle new message
     if request.method == 'POST':
@@ -82,10 +58,6 @@ def conversation_detail(request, conversation_id):
                 content=content
             )
             
-            # Update conversation timestamp
-            conversation.updated_at = timezone.now()
-            conversation.save()
-            
             # Create notifications for other participants
             for participant in conversation.participants.exclude(id=request.user.id):
                 Notification.objects.create(
@@ -112,17 +84,13 @@ def conversation_detail(request, conversation_id):
             return redirect('conversation_detail', conversation_id=conversation.id)
     
     # Get all conversations for sidebar
-    all_conversations = Conversation.objects.filter(
-        participants=request.user,
-        is_active=True
-    ).annotate(
-        last_message_time=Max('messages__created_at'),
-        unread_count=Count('messages', filter=Q(messages__is_read=False) & ~Q(messages__sender=request.user))
-    ).order_by('-last_message_time')
+    all_conversations = conversation_list(request.user)
     
     context = {
         'conversation': conversation,
         'messages': page_messages,
+        'older_cursor': older_cursor,
+        'viewing_history': before is not None,
         'conversations': all_conversations,
         'active_conversation': conversation
     }
@@ -136,7 +104,6 @@ def start_conversation(request):
     if request.method == 'POST':
         recipient_id = request.POST.get('recipient_id')
         message_content = request.POST.get('content', '').strip()
-        conversation_type = request.POST.get('conversation_type', 'direct_message')
         
         if not recipient_id or not message_content:
             messages.error(request, 'Please select a recipient and enter a message.')
@@ -148,43 +115,17 @@ def start_conversation(request):
             messages.error(request, 'Selected user not found.')
             return redirect('messenger_home')
         
-        # Check if conversation already exists between these users
-        existing_conversation = Conversation.objects.filter(
-            participants=request.user,
-            conversation_type='direct_message'
-        ).filter(participants=recipient).first()
+        # One direct message conversation per pair of users
+        title = f"Chat between {request.user.first_name or request.user.username} and {recipient.first_name or recipient.username}"
+        conversation, created = Conversation.get_or_create_direct(request.user, recipient, title)
         
-        if existing_conversation:
-            # Add message to existing conversation
-            ConversationMessage.objects.create(
-                conversation=existing_conversation,
-                sender=request.user,
-                content=message_content
-            )
-            existing_conversation.updated_at = timezone.now()
-            existing_conversation.save()
-            
-            return redirect('conversation_detail', conversation_id=existing_conversation.id)
-        else:
-            # Create new conversation
-            title = f"Chat between {request.user.first_name or request.user.username} and {recipient.first_name or recipient.username}"
-            
-            conversation = Conversation.objects.create(
-                title=title,
-                conversation_type=conversation_type,
-                created_by=request.user
-            )
-            
-            # Add participants
-            conversation.participants.add(request.user, recipient)
-            
-            # Create first message
-            ConversationMessage.objects.create(
-                conversation=conversation,
-                sender=request.user,
-                content=message_content
-            )
-            
+        ConversationMessage.objects.create(
+            conversation=conversation,
+            sender=request.user,
+            content=message_content
+        )
+        
+        if created:
             # Create notification for recipient
             Notification.objects.create(
                 user=recipient,
@@ -197,7 +138,8 @@ def start_conversation(request):
             )
             
             messages.success(request, f'Conversation started with {recipient.first_name or recipient.username}!')
-            return redirect('conversation_detail', conversation_id=conversation.id)
+        
+        return redirect('conversation_detail', conversation_id=conversation.id)
     
     return redirect('messenger_home')
 
@@ -267,21 +209,27 @@ def start_question_conversation(request, question_id):
 @login_required
 @require_POST
 def get_conversation_messages(request, conversation_id):
-    """AJAX endpoint to get latest messages"""
+    """
+    AJAX endpoint for message history: messages after ``last_message_id``
+    (polling) or, when ``before`` is given, the page of older messages below it
+    """
     conversation = get_object_or_404(
         Conversation, 
         id=conversation_id, 
         participants=request.user
     )
     
-    last_message_id = request.POST.get('last_message_id', 0)
-    
-    new_messages = conversation.messages.filter(
-        id__gt=last_message_id
-    ).select_related('sender')
+    before = parse_message_id(request.POST.get('before'))
+    if before is not None:
+        page, older_cursor = messages_before(conversation, before)
+        has_more = False
+    else:
+        last_message_id = parse_message_id(request.POST.get('last_message_id'))
+        page, has_more = messages_after(conversation, last_message_id)
+        older_cursor = None
     
     messages_data = []
-    for message in new_messages:
+    for message in page:
         messages_data.append({
             'id': message.id,
             'content': message.content,
@@ -293,32 +241,21 @@ def get_conversation_messages(request, conversation_id):
     
     return JsonResponse({
         'success': True,
-        'messages': messages_data
+        'messages': messages_data,
+        'has_more': has_more,
+        'older_cursor': older_cursor
     })
 
 
 @login_required
 def search_users(request):
-    """Search for users to start conversations with"""
+    """
+    Search for users to start conversations with; an empty query suggests
+    the user's recent contacts
+    """
     query = request.GET.get('q', '').strip()
     
-    if len(query) < 2:
-        return JsonResponse({'users': []})
-    
-    users = User.objects.filter(
-        Q(first_name__icontains=query) | 
-        Q(last_name__icontains=query) | 
-        Q(username__icontains=query),
-        is_active=True
-    ).exclude(id=request.user.id)[:10]
-    
-    users_data = []
-    for user in users:
-        users_data.append({
-            'id': user.id,
-            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
-            'username': user.username,
-            'is_staff': user.is_staff
-        })
+    if not query:
+        return JsonResponse({'users': recent_contacts(request.user), 'recent': True})
     
-    return JsonResponse({'users': users_data})
+    return JsonResponse({'users': find_recipients(request.user, query), 'recent': False})
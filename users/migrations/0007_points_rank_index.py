@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+TREE_SIZE = 2 ** 22
+
+
+def build_rank_index(apps, schema_editor):
+    StudentPoints = apps.get_model('users', 'StudentPoints')
+    PointsRankNode = apps.get_model('users', 'PointsRankNode')
+
+    tree = {}
+    histogram = StudentPoints.objects.values_list('total_points').annotate(students=Count('id'))
+    for points, students in histogram:
+        position = min(max(points, 0), TREE_SIZE - 1) + 1
+        while position <= TREE_SIZE:
+            tree[position] = tree.get(position, 0) + students
+            position += position & -position
+    PointsRankNode.objects.bulk_create(
+        [PointsRankNode(position=position, students=students) for position, students in tree.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsRankNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(unique=True)),
+                ('students', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_rank_index, migrations.RunPython.noop),
+    ]
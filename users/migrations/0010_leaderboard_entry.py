@@ -0,0 +1,58 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank
+
+CATEGORIES = {
+    'total': 'total_points',
+    'questions': 'questions_points',
+    'answers': 'answers_points',
+    'level': 'level',
+    'streak': 'current_streak',
+}
+
+
+def build_leaderboard(apps, schema_editor):
+    StudentPoints = apps.get_model('users', 'StudentPoints')
+    LeaderboardEntry = apps.get_model('users', 'LeaderboardEntry')
+
+    for category, field in CATEGORIES.items():
+        rows = (
+            StudentPoints.objects.filter(student__is_staff=False)
+            .annotate(dense_rank=Window(DenseRank(), order_by=F(field).desc()))
+            .values_list('student_id', field, 'dense_rank')
+        )
+        LeaderboardEntry.objects.bulk_create(
+            [LeaderboardEntry(category=category, student_id=student_id, score=score, rank=rank)
+             for student_id, score, rank in rows],
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_outbox_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('score', models.IntegerField(default=0)),
+                ('rank', models.PositiveIntegerField(default=1)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'rank', 'student'], name='users_board_rank_idx'), models.Index(fields=['category', 'score'], name='users_board_score_idx')],
+                'unique_together': {('category', 'student')},
+            },
+        ),
+        migrations.RunPython(build_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_leaderboard_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningstreak',
+            index=models.Index(fields=['date', 'student', 'points_earned'], name='users_streak_day_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+POINT_COLUMNS = ('questions_points', 'answers_points', 'helping_points', 'consistency_points')
+
+
+def record_opening_balances(apps, schema_editor):
+    """Seed the ledger so that replaying it reproduces today's StudentPoints"""
+    StudentPoints = apps.get_model('users', 'StudentPoints')
+    PointsTransaction = apps.get_model('users', 'PointsTransaction')
+
+    rows = []
+    for points_obj in StudentPoints.objects.order_by('student_id').iterator(chunk_size=1000):
+        for column in POINT_COLUMNS:
+            if getattr(points_obj, column):
+                rows.append(PointsTransaction(student_id=points_obj.student_id, activity_type='opening_balance',
+                                              column=column, points=getattr(points_obj, column)))
+        difference = points_obj.total_points - sum(getattr(points_obj, column) for column in POINT_COLUMNS)
+        if difference:
+            rows.append(PointsTransaction(student_id=points_obj.student_id, activity_type='opening_balance',
+                                          column='', points=difference))
+        if len(rows) >= 1000:
+            PointsTransaction.objects.bulk_create(rows)
+            rows = []
+    PointsTransaction.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_learning_streak_day_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(max_length=50)),
+                ('column', models.CharField(blank=True, max_length=30)),
+                ('points', models.IntegerField()),
+                ('idempotency_key', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['student', 'id'], name='users_ledger_student_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
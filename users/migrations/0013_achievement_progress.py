@@ -0,0 +1,88 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The achievement rules as they stood when progress tracking was added,
+# frozen here so later rule changes do not alter this migration
+
+CATEGORY_METRICS = {
+    'questions': 'questions_points',
+    'answers': 'answers_points',
+    'helping': 'helping_points',
+    'consistency': 'consistency_points',
+}
+
+NAMED_RULES = [
+    (('first question',), 'questions_points', 1),
+    (('first answer',), 'answers_points', 1),
+    (('streak', '7 day'), 'current_streak', 7),
+    (('streak', '30 day'), 'current_streak', 30),
+    (('level', 'level 5'), 'level', 5),
+    (('level', 'level 10'), 'level', 10),
+]
+
+METRICS = ('total_points', 'level', 'current_streak') + tuple(CATEGORY_METRICS.values())
+
+
+def compile_rule(achievement):
+    """(metric, threshold, achievement) for an Achievement, or None if it can never be earned"""
+    if achievement.points_required > 0:
+        return CATEGORY_METRICS.get(achievement.category, 'total_points'), achievement.points_required, achievement
+
+    name = achievement.name.lower()
+    for phrases, metric, threshold in NAMED_RULES:
+        if all(phrase in name for phrase in phrases):
+            return metric, threshold, achievement
+    return None
+
+
+def seed_progress(apps, schema_editor):
+    """Progress of every student toward each active achievement they have started"""
+    Achievement = apps.get_model('users', 'Achievement')
+    AchievementProgress = apps.get_model('users', 'AchievementProgress')
+    StudentPoints = apps.get_model('users', 'StudentPoints')
+
+    rules = [rule for rule in map(compile_rule, Achievement.objects.filter(is_active=True)) if rule is not None]
+    if not rules:
+        return
+    rows = []
+    for student_id, *values in (
+        StudentPoints.objects.order_by('student_id').values_list('student_id', *METRICS).iterator(chunk_size=1000)
+    ):
+        values = dict(zip(METRICS, values))
+        for metric, threshold, achievement in rules:
+            if values[metric] and values[metric] > 0:
+                rows.append(AchievementProgress(student_id=student_id, achievement_id=achievement.id,
+                                                value=min(values[metric], threshold), target=threshold))
+        if len(rows) >= 1000:
+            AchievementProgress.objects.bulk_create(rows)
+            rows = []
+    AchievementProgress.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_points_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveIntegerField(default=0)),
+                ('target', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('achievement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='users.achievement')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievement_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('student', 'achievement')},
+            },
+        ),
+        migrations.RunPython(seed_progress, migrations.RunPython.noop),
+    ]
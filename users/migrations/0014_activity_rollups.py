@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_achievement_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='studentactivity',
+            index=models.Index(fields=['timestamp'], name='users_activity_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='studentactivityrollup',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='studentactivityrollup',
+            index=models.Index(fields=['date', 'activity_type'], name='users_rollup_day_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentactivityrollup',
+            unique_together={('student', 'activity_type', 'date')},
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:48
+
+from django.db import migrations
+
+# The starter catalog as it stood when seeding moved here, frozen so later
+# edits to users.achievement_rules.DEFAULT_ACHIEVEMENTS do not alter it
+DEFAULT_ACHIEVEMENTS = [
+    {
+        'name': 'First Question',
+        'description': 'Asked your first question',
+        'icon': 'fas fa-question-circle',
+        'points_required': 0,
+        'category': 'questions',
+        'color': 'bronze'
+    },
+    {
+        'name': 'First Answer',
+        'description': 'Provided your first answer',
+        'icon': 'fas fa-comment',
+        'points_required': 0,
+        'category': 'answers',
+        'color': 'bronze'
+    },
+    {
+        'name': 'Curious Mind',
+        'description': 'Asked 10 questions',
+        'icon': 'fas fa-brain',
+        'points_required': 50,
+        'category': 'questions',
+        'color': 'silver'
+    },
+    {
+        'name': 'Helper',
+        'description': 'Provided 10 helpful answers',
+        'icon': 'fas fa-hands-helping',
+        'points_required': 100,
+        'category': 'answers',
+        'color': 'silver'
+    },
+    {
+        'name': 'Consistent Learner',
+        'description': 'Maintained a 7-day learning streak',
+        'icon': 'fas fa-fire',
+        'points_required': 35,
+        'category': 'consistency',
+        'color': 'gold'
+    },
+    {
+        'name': 'Expert',
+        'description': 'Reached Level 5',
+        'icon': 'fas fa-star',
+        'points_required': 2500,
+        'category': 'expertise',
+        'color': 'gold'
+    },
+    {
+        'name': 'Master',
+        'description': 'Reached Level 10',
+        'icon': 'fas fa-crown',
+        'points_required': 10000,
+        'category': 'expertise',
+        'color': 'platinum'
+    },
+    {
+        'name': 'Community Builder',
+        'description': 'Helped 50 students with answers',
+        'icon': 'fas fa-users',
+        'points_required': 500,
+        'category': 'community',
+        'color': 'gold'
+    }
+]
+
+
+def seed_catalog(apps, schema_editor):
+    """Create the default achievements once, instead of on every signup"""
+    Achievement = apps.get_model('users', 'Achievement')
+    existing = set(Achievement.objects.values_list('name', flat=True))
+    Achievement.objects.bulk_create([
+        Achievement(**achievement_data) for achievement_data in DEFAULT_ACHIEVEMENTS
+        if achievement_data['name'] not in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_catalog, migrations.RunPython.noop),
+    ]
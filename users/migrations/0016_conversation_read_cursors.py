@@ -0,0 +1,68 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def derive_cursors(apps, schema_editor):
+    """Each participant's cursor is the newest message they have a read status for"""
+    MessageReadStatus = apps.get_model('users', 'MessageReadStatus')
+    ConversationReadCursor = apps.get_model('users', 'ConversationReadCursor')
+
+    rows = (
+        MessageReadStatus.objects.order_by()
+        .values('message__conversation_id', 'user_id')
+        .annotate(last_read_id=Max('message_id'))
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for row in rows:
+        batch.append(ConversationReadCursor(
+            conversation_id=row['message__conversation_id'], user_id=row['user_id'], last_read_id=row['last_read_id']
+        ))
+        if len(batch) >= 1000:
+            ConversationReadCursor.objects.bulk_create(batch)
+            batch = []
+    ConversationReadCursor.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_seed_achievement_catalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='users.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(derive_cursors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conversationmessage',
+            index=models.Index(fields=['conversation', 'id', 'sender'], name='users_convmsg_cursor_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='conversationmessage',
+            name='users_convmsg_unread_idx',
+        ),
+        migrations.RemoveField(
+            model_name='conversationmessage',
+            name='is_read',
+        ),
+        migrations.DeleteModel(
+            name='MessageReadStatus',
+        ),
+    ]
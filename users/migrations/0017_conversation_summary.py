@@ -0,0 +1,80 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    """Last message summary per conversation; a cursor with unread count per participant"""
+    Conversation = apps.get_model('users', 'Conversation')
+    ConversationMessage = apps.get_model('users', 'ConversationMessage')
+    ConversationReadCursor = apps.get_model('users', 'ConversationReadCursor')
+
+    for conversation in Conversation.objects.prefetch_related('participants').iterator(chunk_size=500):
+        last = ConversationMessage.objects.filter(conversation=conversation).order_by('-id').first()
+        if last is not None:
+            Conversation.objects.filter(pk=conversation.pk).update(
+                last_message=last, last_message_preview=last.content[:100],
+                last_message_sender=last.sender_id, last_message_at=last.created_at
+            )
+        last_message_at = last.created_at if last is not None else conversation.created_at
+
+        cursors = {cursor.user_id: cursor for cursor in ConversationReadCursor.objects.filter(conversation=conversation)}
+        for participant in conversation.participants.all():
+            cursor = cursors.get(participant.pk) or ConversationReadCursor(
+                conversation=conversation, user=participant, last_read_id=0
+            )
+            cursor.last_message_at = last_message_at
+            cursor.unread_count = (
+                ConversationMessage.objects.filter(conversation=conversation, id__gt=cursor.last_read_id)
+                .exclude(sender=participant).count()
+            )
+            cursor.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_conversation_read_cursors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.conversationmessage'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversationreadcursor',
+            name='last_message_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='conversationreadcursor',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversationreadcursor',
+            index=models.Index(fields=['user', '-last_message_at'], name='users_cursor_inbox_idx'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-17 04:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_direct_keys(apps, schema_editor):
+    """Key every two-party direct message; when a pair has several, the oldest keeps the key"""
+    Conversation = apps.get_model('users', 'Conversation')
+
+    seen = set()
+    pending = []
+    conversations = (
+        Conversation.objects.filter(conversation_type='direct_message')
+        .annotate(participant_count=Count('participants'))
+        .filter(participant_count=2)
+        .order_by('id')
+        .prefetch_related('participants')
+    )
+    for conversation in conversations.iterator(chunk_size=500):
+        key = '{}:{}'.format(*sorted(user.id for user in conversation.participants.all()))
+        if key not in seen:
+            seen.add(key)
+            conversation.direct_key = key
+            pending.append(conversation)
+        if len(pending) >= 500:
+            Conversation.objects.bulk_update(pending, ['direct_key'])
+            pending = []
+    Conversation.objects.bulk_update(pending, ['direct_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='direct_key',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_direct_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-17 05:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def search_terms(username, first_name, last_name):
+    """The terms a user is found by, as users.user_search defined them when this was written"""
+    full_name = f'{first_name} {last_name}'.strip()
+    return {term.lower() for term in (username, first_name, last_name, full_name) if term}
+
+
+def index_users(apps, schema_editor):
+    """Index every existing user under their search terms"""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserSearchTerm = apps.get_model('users', 'UserSearchTerm')
+
+    rows = User.objects.values_list('id', 'username', 'first_name', 'last_name').iterator(chunk_size=1000)
+    batch = []
+    for user_id, username, first_name, last_name in rows:
+        batch.extend(
+            UserSearchTerm(user_id=user_id, term=term) for term in search_terms(username, first_name, last_name)
+        )
+        if len(batch) >= 1000:
+            UserSearchTerm.objects.bulk_create(batch)
+            batch = []
+    UserSearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_conversation_direct_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=301)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'user'], name='users_search_term_idx')],
+                'unique_together': {('user', 'term')},
+            },
+        ),
+        migrations.RunPython(index_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.core.management import call_command
+from django.db import migrations
+
+# The 'shared' cache's table, as settings.CACHES named it when this was written
+TABLE = 'askup_shared_cache'
+
+
+def create_cache_table(apps, schema_editor):
+    """Create the shared cache table (a no-op if it already exists)"""
+    call_command('createcachetable', TABLE, database=schema_editor.connection.alias, verbosity=0)
+
+
+def drop_cache_table(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {schema_editor.quote_name(TABLE)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_user_search_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, drop_cache_table),
+    ]
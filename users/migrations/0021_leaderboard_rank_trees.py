@@ -0,0 +1,70 @@
+# Generated by Django 5.2.3 on 2026-10-17 05:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+TREE_SIZE = 2 ** 22
+
+
+def build_score_trees(apps, schema_editor):
+    """Build each category's distinct-score tree from the existing board"""
+    LeaderboardEntry = apps.get_model('users', 'LeaderboardEntry')
+    LeaderboardNode = apps.get_model('users', 'LeaderboardNode')
+
+    trees = {}
+    for category, score in LeaderboardEntry.objects.values_list('category', 'score').distinct():
+        tree = trees.setdefault(category, {})
+        position = min(max(score, 0), TREE_SIZE - 1) + 1
+        while position <= TREE_SIZE:
+            tree[position] = tree.get(position, 0) + 1
+            position += position & -position
+    LeaderboardNode.objects.bulk_create(
+        [
+            LeaderboardNode(category=category, tree='scores', position=position, count=count)
+            for category, tree in trees.items()
+            for position, count in tree.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_shared_cache_table'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('tree', models.CharField(choices=[('scores', 'Distinct scores')], max_length=10)),
+                ('position', models.PositiveIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='users_board_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='users_board_score_idx',
+        ),
+        migrations.RemoveField(
+            model_name='leaderboardentry',
+            name='rank',
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['category', '-score', 'student'], name='users_board_order_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardnode',
+            unique_together={('category', 'tree', 'position')},
+        ),
+        migrations.RunPython(build_score_trees, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-17 05:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+TREE_SIZE = 2 ** 22
+
+
+def build_student_trees(apps, schema_editor):
+    """Build each category's students-per-score tree from the existing board"""
+    LeaderboardEntry = apps.get_model('users', 'LeaderboardEntry')
+    LeaderboardNode = apps.get_model('users', 'LeaderboardNode')
+
+    trees = {}
+    histogram = LeaderboardEntry.objects.values_list('category', 'score').annotate(students=Count('id'))
+    for category, score, students in histogram:
+        tree = trees.setdefault(category, {})
+        position = min(max(score, 0), TREE_SIZE - 1) + 1
+        while position <= TREE_SIZE:
+            tree[position] = tree.get(position, 0) + students
+            position += position & -position
+    LeaderboardNode.objects.bulk_create(
+        [
+            LeaderboardNode(category=category, tree='students', position=position, count=count)
+            for category, tree in trees.items()
+            for position, count in tree.items()
+        ],
+        batch_size=1000
+    )
+
+
+def drop_student_trees(apps, schema_editor):
+    apps.get_model('users', 'LeaderboardNode').objects.filter(tree='students').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_leaderboard_rank_trees'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leaderboardnode',
+            name='tree',
+            field=models.CharField(choices=[('scores', 'Distinct scores'), ('students', 'Students per score')], max_length=10),
+        ),
+        migrations.RunPython(build_student_trees, drop_student_trees),
+    ]
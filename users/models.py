@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -92,6 +92,9 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read'], name='users_msg_recipient_read_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username}: {self.subject[:50]}"
@@ -121,10 +124,29 @@ class StudentActivity(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='users_activity_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.activity_type} at {self.timestamp}"
 
+class StudentActivityRollup(models.Model):
+    """Daily per-type activity counts folded from old StudentActivity rows (see users/activity_log.py)"""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    activity_type = models.CharField(max_length=50)
+    date = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['student', 'activity_type', 'date']
+        indexes = [
+            models.Index(fields=['date', 'activity_type'], name='users_rollup_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.activity_type} on {self.date} ({self.count})"
+
 # Gamification Models
 class Achievement(models.Model):
     """Achievement badges that students can earn"""
@@ -194,6 +216,86 @@ class StudentPoints(models.Model):
             return True  # Level up occurred
         return False
 
+class PointsTransaction(models.Model):
+    """
+    Append-only ledger of point changes; StudentPoints is its projection
+    (see users/points_ledger.py). Rows are never updated or deleted.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_transactions')
+    activity_type = models.CharField(max_length=50)
+    column = models.CharField(max_length=30, blank=True)  # StudentPoints category column; blank = total only
+    points = models.IntegerField()
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['student', 'id'], name='users_ledger_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} {self.points:+d} ({self.activity_type})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Points transactions are append-only')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Points transactions are append-only')
+
+class PointsRankNode(models.Model):
+    """Node of the Fenwick tree over total_points that backs rank lookups (see users/ranking.py)"""
+    position = models.PositiveIntegerField(unique=True)
+    students = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"Rank node {self.position}: {self.students} students"
+
+class LeaderboardNode(models.Model):
+    """Node of a per-category Fenwick tree behind leaderboard ranks (see users/leaderboard.py)"""
+    TREES = [
+        ('scores', 'Distinct scores'),
+        ('students', 'Students per score'),
+    ]
+    
+    category = models.CharField(max_length=20)
+    tree = models.CharField(max_length=10, choices=TREES)
+    position = models.PositiveIntegerField()
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['category', 'tree', 'position']
+    
+    def __str__(self):
+        return f"{self.category} {self.tree} node {self.position}: {self.count}"
+
+class LeaderboardEntry(models.Model):
+    """Materialized leaderboard row with a score per category (see users/leaderboard.py)"""
+    category = models.CharField(max_length=20)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['category', 'student']
+        indexes = [
+            # Board order (score descending, ties by student) read forwards or backwards
+            models.Index(fields=['category', '-score', 'student'], name='users_board_order_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} ({self.category}: {self.score})"
+    
+    # Display values come from the student's points row (select_related('student__points'))
+    @property
+    def level(self):
+        return self.student.points.level
+    
+    @property
+    def total_points(self):
+        return self.student.points.total_points
+
 class StudentAchievement(models.Model):
     """Track achievements earned by students"""
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievements')
@@ -207,6 +309,24 @@ class StudentAchievement(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.achievement.name}"
 
+class AchievementProgress(models.Model):
+    """A student's progress toward an achievement, kept up to date by award_points"""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievement_progress')
+    achievement = models.ForeignKey(Achievement, on_delete=models.CASCADE, related_name='progress')
+    value = models.PositiveIntegerField(default=0)  # Metric value, capped at target
+    target = models.PositiveIntegerField()  # Threshold of the achievement's rule
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'achievement']
+
+    def __str__(self):
+        return f"{self.student.username} - {self.achievement.name} ({self.value}/{self.target})"
+
+    @property
+    def percentage(self):
+        return min(100, (self.value / self.target) * 100) if self.target else 100
+
 class LearningStreak(models.Model):
     """Track daily learning streaks"""
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='streaks')
@@ -217,10 +337,29 @@ class LearningStreak(models.Model):
     class Meta:
         unique_together = ['student', 'date']
         ordering = ['-date']
+        indexes = [
+            # Covers the windowed leaderboards: a date range summed per student
+            models.Index(fields=['date', 'student', 'points_earned'], name='users_streak_day_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.date} ({self.activities_count} activities)"
 
+class StreakBonusGrant(models.Model):
+    """Ledger of streak bonuses granted, at most one per student per day"""
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='streak_bonuses')
+    date = models.DateField()
+    bonus_type = models.CharField(max_length=30)  # 'daily_streak', 'weekly_streak' or 'monthly_streak'
+    points = models.IntegerField(default=0)
+    granted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['student', 'date']
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.bonus_type} on {self.date}"
+
 # Notification System
 class Notification(models.Model):
     """Real-time notifications for users"""
@@ -248,6 +387,11 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='users_notif_user_read_idx'),
+            # Unread badge counts only ever look at the unread slice
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='users_notif_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -259,6 +403,31 @@ class Notification(models.Model):
             self.read_at = timezone.now()
             self.save()
 
+class OutboxEvent(models.Model):
+    """Side effects of a user action, written with the action and drained by process_outbox"""
+    EVENT_TYPES = [
+        ('question_asked', 'Question Asked'),
+        ('answer_posted', 'Answer Posted'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbox_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The worker only ever scans the pending slice
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='users_outbox_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} for {self.user.username}"
+
 class NotificationPreference(models.Model):
     """User notification preferences"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_preferences')
@@ -305,17 +474,45 @@ class Conversation(models.Model):
     # For question-related conversations
     related_question = models.ForeignKey('qna.Question', on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
     
+    # Latest message summary, kept up to date when a message is posted (see users/read_cursors.py)
+    last_message = models.ForeignKey('ConversationMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=100, blank=True)
+    last_message_sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
+    # "<lower user id>:<higher user id>" for direct messages, so each pair has at most one
+    direct_key = models.CharField(max_length=50, null=True, blank=True, unique=True)
+    
     class Meta:
         ordering = ['-updated_at']
     
     def __str__(self):
         return f"{self.title} - {self.get_conversation_type_display()}"
     
+    @staticmethod
+    def direct_key_for(user_id, other_id):
+        return '{}:{}'.format(*sorted((user_id, other_id)))
+    
+    @classmethod
+    def get_or_create_direct(cls, user, other, title):
+        """
+        The direct message conversation between two users, created on first
+        use. Concurrent starts resolve to the same row through the unique key.
+        """
+        with transaction.atomic():
+            conversation, created = cls.objects.get_or_create(
+                direct_key=cls.direct_key_for(user.id, other.id),
+                defaults={'title': title, 'conversation_type': 'direct_message', 'created_by': user}
+            )
+            if created:
+                conversation.participants.add(user, other)
+        return conversation, created
+    
     def get_last_message(self):
         return self.messages.last()
     
     def get_unread_count(self, user):
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        return self.read_cursors.filter(user=user).values_list('unread_count', flat=True).first() or 0
 
 class ConversationMessage(models.Model):
     """Individual messages within a conversation"""
@@ -323,25 +520,52 @@ class ConversationMessage(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_messages')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     
     # File attachments (optional)
     attachment = models.FileField(upload_to='message_attachments/', null=True, blank=True)
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Unread counts are "messages after my cursor", per conversation
+            models.Index(fields=['conversation', 'id', 'sender'], name='users_convmsg_cursor_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}..."
 
-class MessageReadStatus(models.Model):
-    """Track read status for each user in conversation"""
-    message = models.ForeignKey(ConversationMessage, on_delete=models.CASCADE, related_name='read_statuses')
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    read_at = models.DateTimeField(auto_now_add=True)
+class ConversationReadCursor(models.Model):
+    """A participant's read position and unread summary for a conversation (see users/read_cursors.py)"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_cursors')
+    last_read_id = models.BigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+    # Copy of the conversation's last message time (its creation time until then), for ordering
+    last_message_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['conversation', 'user']
+        indexes = [
+            # A user's conversation list, most recent first
+            models.Index(fields=['user', '-last_message_at'], name='users_cursor_inbox_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} read {self.conversation_id} up to {self.last_read_id}"
+
+
+class UserSearchTerm(models.Model):
+    """A lowercased name a user can be found by in the recipient picker (see users/user_search.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=301)
     
     class Meta:
-        unique_together = ['message', 'user']
+        unique_together = ['user', 'term']
+        indexes = [
+            # Prefix lookups are range scans: term >= 'ab' AND term < 'ab\U0010ffff'
+            models.Index(fields=['term', 'user'], name='users_search_term_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} read message at {self.read_at}"
+        return f"{self.term} -> {self.user_id}"
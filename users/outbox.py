@@ -0,0 +1,183 @@
+"""
+Transactional outbox for AskUP
+Views record an OutboxEvent in the same transaction as the question or answer
+they create; the process_outbox worker later applies the side effects (profile
+counters, points, streaks, achievements, notifications) in batches.
+
+Each user's events are applied and marked processed in one transaction, so a
+crashed or restarted worker simply picks the same events up again and an
+event's effects are never applied twice. If the group fails, its events are
+retried one at a time so a single bad event cannot hold back the others.
+"""
+
+from itertools import groupby
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .gamification import GamificationManager
+from .models import Notification, OutboxEvent, UserProfile
+from .status_snapshot import invalidate_user_status
+
+QUESTION_ASKED = 'question_asked'
+ANSWER_POSTED = 'answer_posted'
+
+BATCH_SIZE = 100
+
+# Events that keep failing are left for inspection instead of retried forever
+MAX_ATTEMPTS = 5
+
+
+def record_event(user, event_type, **payload):
+    """Queue a side-effect event; call inside the transaction of the action itself"""
+    return OutboxEvent.objects.create(user=user, event_type=event_type, payload=payload)
+
+
+def pending_events():
+    return OutboxEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+
+
+def achievement_notifications(user, gamification_result):
+    """Notifications for the badges earned by one award"""
+    return [
+        Notification(
+            user=user,
+            title=f'Achievement Unlocked: {achievement.name}!',
+            message=f'Congratulations! You earned the "{achievement.name}" badge: {achievement.description}',
+            notification_type='achievement_earned',
+            icon=achievement.icon,
+            color='success'
+        )
+        for achievement in gamification_result['new_achievements']
+    ]
+
+
+def level_up_notification(user, level, points_awarded):
+    return Notification(
+        user=user,
+        title=f'Level Up! You are now Level {level}',
+        message=f'Amazing progress! You\'ve reached Level {level} and earned {points_awarded} points!',
+        notification_type='level_up',
+        icon='fas fa-star',
+        color='warning'
+    )
+
+
+def new_answer_notification(user, payload):
+    return Notification(
+        user_id=payload['question_author_id'],
+        title='New Answer to Your Question!',
+        message=f'{user.first_name or user.username} answered your question "{payload["question_title"][:50]}..."',
+        notification_type='new_answer',
+        action_url=f'/question/{payload["question_id"]}/',
+        icon='fas fa-comment',
+        color='info'
+    )
+
+
+def apply_user_events(user, events):
+    """
+    Apply one user's events in order. The group's points are awarded in one
+    ledger write, profile counters are bumped once and only the highest
+    level reached gets a notification.
+    """
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    asked = answered = 0
+    awards = []
+    notifications = []
+
+    for event in events:
+        if event.event_type == QUESTION_ASKED:
+            activity = 'first_question' if profile.questions_asked + asked == 0 else 'question_asked'
+            asked += 1
+        elif event.event_type == ANSWER_POSTED:
+            activity = 'first_answer' if profile.answers_given + answered == 0 else 'answer_given'
+            answered += 1
+            if event.payload.get('question_author_id') not in (None, user.id):
+                notifications.append(new_answer_notification(user, event.payload))
+        else:
+            continue
+        awards.append((activity, None, f'outbox:{event.id}'))
+
+    if awards:
+        result = GamificationManager.award_many(user, awards)
+        notifications.extend(achievement_notifications(user, result))
+        if result['level_up']:
+            notifications.append(level_up_notification(user, result['new_level'], result['points_awarded']))
+
+    if asked or answered:
+        UserProfile.objects.filter(pk=profile.pk).update(
+            questions_asked=F('questions_asked') + asked,
+            answers_given=F('answers_given') + answered
+        )
+    # bulk_create skips the Notification signals, so refresh the badges here
+    Notification.objects.bulk_create(notifications)
+    for user_id in {notification.user_id for notification in notifications} | {user.id}:
+        invalidate_user_status(user_id)
+
+
+def apply_and_mark(user, event_ids):
+    """
+    Apply and mark processed the given events of one user in a single
+    transaction. Returns the number of events applied.
+    """
+    with transaction.atomic():
+        # Re-read under the write lock: another worker may have taken them
+        events = list(pending_events().select_for_update().filter(id__in=event_ids).order_by('id'))
+        if events:
+            apply_user_events(user, events)
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                processed_at=timezone.now()
+            )
+    return len(events)
+
+
+def record_failure(event_id, exc):
+    OutboxEvent.objects.filter(id=event_id, processed_at__isnull=True).update(
+        attempts=F('attempts') + 1,
+        last_error=repr(exc)
+    )
+
+
+def retry_each(user, event_ids):
+    """Apply events one at a time, charging an attempt only to those that fail"""
+    processed = failed = 0
+    for event_id in event_ids:
+        try:
+            processed += apply_and_mark(user, [event_id])
+        except Exception as exc:
+            record_failure(event_id, exc)
+            failed += 1
+    return processed, failed
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    """
+    Apply up to ``batch_size`` pending events, grouped per user.
+
+    When a user's group fails, its events are retried one by one so only
+    the event that fails is charged an attempt. Returns (processed, failed)
+    event counts.
+    """
+    batch = list(pending_events().order_by('id').values_list('user_id', 'id')[:batch_size])
+    if not batch:
+        return 0, 0
+
+    users = User.objects.in_bulk({user_id for user_id, event_id in batch})
+    batch.sort()
+    processed = failed = 0
+    for user_id, rows in groupby(batch, key=lambda row: row[0]):
+        event_ids = [event_id for _, event_id in rows]
+        try:
+            processed += apply_and_mark(users[user_id], event_ids)
+        except Exception as exc:
+            if len(event_ids) == 1:
+                record_failure(event_ids[0], exc)
+                failed += 1
+            else:
+                retried = retry_each(users[user_id], event_ids)
+                processed += retried[0]
+                failed += retried[1]
+    return processed, failed
@@ -0,0 +1,89 @@
+"""
+Points ledger for AskUP
+Every point change is an immutable PointsTransaction row; StudentPoints is a
+projection of a student's rows folded in id order. Each row adds its points
+to its category column and to the total, both floored at 0, and the level
+never drops below the level reached by any running total.
+
+award_points applies new rows with exactly the same rules, so replaying the
+ledger reproduces the live counters.
+"""
+
+import math
+from itertools import groupby
+from operator import itemgetter
+
+from .models import PointsTransaction, StudentPoints
+
+POINT_COLUMNS = ('questions_points', 'answers_points', 'helping_points', 'consistency_points')
+
+
+def level_for(total_points):
+    """Python twin of GamificationManager.level_expression"""
+    return int(math.sqrt(total_points / 100.0)) + 1
+
+
+class PointsProjection:
+    """Running fold of one student's ledger rows"""
+
+    def __init__(self):
+        self.columns = dict.fromkeys(POINT_COLUMNS, 0)
+        self.total_points = 0
+        self.level = 1
+
+    def apply(self, column, points):
+        if column:
+            self.columns[column] = max(self.columns[column] + points, 0)
+        self.total_points = max(self.total_points + points, 0)
+        self.level = max(self.level, level_for(self.total_points))
+
+
+def replay(batch_size=1000, progress=None):
+    """
+    Rebuild every StudentPoints projection from the ledger.
+
+    The ledger (ordered by student, id) and StudentPoints (ordered by
+    student) are streamed side by side, so memory stays constant no matter
+    how large either table is. Students without ledger rows project to zero.
+    Returns the number of StudentPoints rows rewritten.
+    """
+    ledger = groupby(
+        PointsTransaction.objects.order_by('student_id', 'id')
+        .values_list('student_id', 'column', 'points')
+        .iterator(chunk_size=batch_size),
+        key=itemgetter(0)
+    )
+    pending_student, pending_rows = next(ledger, (None, ()))
+
+    fields = list(POINT_COLUMNS) + ['total_points', 'level']
+    batch = []
+    written = 0
+    for points_id, student_id in (
+        StudentPoints.objects.order_by('student_id').values_list('id', 'student_id').iterator(chunk_size=batch_size)
+    ):
+        # Ledger rows of students without a points row are skipped
+        while pending_student is not None and pending_student < student_id:
+            pending_student, pending_rows = next(ledger, (None, ()))
+
+        projection = PointsProjection()
+        if pending_student == student_id:
+            for _, column, points in pending_rows:
+                projection.apply(column, points)
+            pending_student, pending_rows = next(ledger, (None, ()))
+
+        batch.append(StudentPoints(
+            id=points_id, total_points=projection.total_points, level=projection.level, **projection.columns
+        ))
+        if len(batch) >= batch_size:
+            StudentPoints.objects.bulk_update(batch, fields)
+            written += len(batch)
+            batch = []
+            if progress:
+                progress(written)
+
+    if batch:
+        StudentPoints.objects.bulk_update(batch, fields)
+        written += len(batch)
+        if progress:
+            progress(written)
+    return written
@@ -0,0 +1,179 @@
+"""
+Rank service for AskUP
+Keeps a Fenwick (binary indexed) tree over total_points in the database so a
+student's rank and percentile cost a single indexed read of ~23 rows, and a
+points change updates ~23 rows, no matter how many students there are.
+Ranks stay exact under ties: rank = 1 + number of students with more points.
+The same tree mechanics back the per-category leaderboard (users/leaderboard.py).
+"""
+
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, Count, F, Q, When
+from .models import PointsRankNode, StudentPoints
+
+
+class FenwickTree:
+    """
+    Fenwick tree over non-negative integer values stored as database rows;
+    position = value + 1. Each node is a row of ``model`` matching ``scope``
+    whose ``field`` holds the node's count.
+    """
+
+    # Values at or above SIZE - 1 share the top position
+    SIZE = 2 ** 22
+
+    def __init__(self, model, field, **scope):
+        self.model = model
+        self.field = field
+        self.scope = scope
+
+    @classmethod
+    def position(cls, value):
+        return min(max(value, 0), cls.SIZE - 1) + 1
+
+    @classmethod
+    def update_path(cls, position):
+        while position <= cls.SIZE:
+            yield position
+            position += position & -position
+
+    @classmethod
+    def query_path(cls, position):
+        while position > 0:
+            yield position
+            position -= position & -position
+
+    def nodes(self):
+        return self.model.objects.filter(**self.scope)
+
+    def update(self, *changes):
+        """Apply (value, delta) changes together; shared ancestors cancel out"""
+        update_trees((self, value, delta) for value, delta in changes)
+
+    def adjust(self, value, delta):
+        """Add ``delta`` to the count at ``value``"""
+        self.update((value, delta))
+
+    def move(self, old_value, new_value):
+        """Move one count from ``old_value`` to ``new_value``"""
+        self.update((old_value, -1), (new_value, 1))
+
+    def build_nodes(self, histogram):
+        """Build tree nodes from (value, count) pairs"""
+        tree = {}
+        for value, count in histogram:
+            for position in self.update_path(self.position(value)):
+                tree[position] = tree.get(position, 0) + count
+        return [
+            self.model(position=position, **{self.field: count}, **self.scope)
+            for position, count in tree.items()
+        ]
+
+    def rebuild(self, histogram):
+        """Replace the tree's nodes with ones built from (value, count) pairs"""
+        self.nodes().delete()
+        nodes = self.build_nodes(histogram)
+        self.model.objects.bulk_create(nodes, batch_size=1000)
+        return len(nodes)
+
+
+def update_trees(changes):
+    """
+    Apply (tree, value, delta) changes to trees that share a model and count
+    field, with one UPDATE however many trees and nodes they touch
+    """
+    deltas = {}
+    model = field = None
+    for tree, value, delta in changes:
+        model, field = tree.model, tree.field
+        scope = tuple(sorted(tree.scope.items()))
+        for position in tree.update_path(tree.position(value)):
+            deltas[scope, position] = deltas.get((scope, position), 0) + delta
+    deltas = {node: delta for node, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def where(nodes):
+        positions = {}
+        for scope, position in nodes:
+            positions.setdefault(scope, []).append(position)
+        return reduce(or_, [Q(position__in=found, **dict(scope)) for scope, found in positions.items()])
+
+    by_delta = {}
+    for node, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(node)
+
+    nodes = model.objects.filter(where(deltas))
+
+    def shift(sign):
+        return Case(
+            *[When(where(found), then=F(field) + sign * delta) for delta, found in by_delta.items()],
+            default=F(field)
+        )
+
+    if nodes.update(**{field: shift(1)}) < len(deltas):
+        # Some nodes do not exist yet: undo, create the missing ones and
+        # apply again so every node gets its delta exactly once
+        nodes.update(**{field: shift(-1)})
+        model.objects.bulk_create(
+            [model(position=position, **dict(scope)) for scope, position in deltas],
+            ignore_conflicts=True
+        )
+        nodes.update(**{field: shift(1)})
+
+
+class PointsRankIndex:
+    """Fenwick tree over total_points, counting students"""
+
+    tree = FenwickTree(PointsRankNode, 'students')
+    SIZE = FenwickTree.SIZE
+
+    @classmethod
+    def adjust(cls, points, delta):
+        """Add ``delta`` students at ``points``"""
+        cls.tree.adjust(points, delta)
+
+    @classmethod
+    def add(cls, points):
+        cls.adjust(points, 1)
+
+    @classmethod
+    def remove(cls, points):
+        cls.adjust(points, -1)
+
+    @classmethod
+    def move(cls, old_points, new_points):
+        """Record a student's total changing from ``old_points`` to ``new_points``"""
+        cls.tree.move(old_points, new_points)
+
+    @classmethod
+    def lookup(cls, points):
+        """Return (rank, percentile) for a total in one query"""
+        position = FenwickTree.position(points)
+        at_most = list(FenwickTree.query_path(position))
+        below = list(FenwickTree.query_path(position - 1))
+        counts = dict(
+            PointsRankNode.objects.filter(position__in=set(at_most + below + [cls.SIZE]))
+            .values_list('position', 'students')
+        )
+        total = counts.get(cls.SIZE, 0)
+        higher = total - sum(counts.get(p, 0) for p in at_most)
+        lower = sum(counts.get(p, 0) for p in below)
+        percentile = (lower / total) * 100 if total else 0
+        return higher + 1, percentile
+
+    @classmethod
+    def rank(cls, points):
+        return cls.lookup(points)[0]
+
+    @classmethod
+    def percentile(cls, points):
+        """Share of students with fewer points, in percent"""
+        return cls.lookup(points)[1]
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole tree from StudentPoints"""
+        return cls.tree.rebuild(StudentPoints.objects.values_list('total_points').annotate(students=Count('id')))
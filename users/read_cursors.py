@@ -0,0 +1,114 @@
+"""
+Messenger read cursors for AskUP
+Each participant keeps the id of the last message they have read in a
+conversation. A message is unread for a user when its id is past their
+cursor and someone else sent it, so opening a conversation marks everything
+read with a single UPDATE instead of a write per message, and group chats
+track every participant separately.
+
+Posting a message also maintains the summaries the conversation list shows:
+the conversation's last message (id, preview, sender, time) and, on every
+cursor, the unread counter and a copy of the last message time. The list is
+then an indexed read of the user's cursors, newest first, instead of an
+aggregate over their whole message history.
+"""
+
+from django.db.models import BigIntegerField, Case, Count, F, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Conversation, ConversationMessage, ConversationReadCursor
+
+PREVIEW_LENGTH = 100
+
+
+def unread_after(conversation_id, user, last_read_id):
+    """Expression counting messages from others past ``last_read_id``"""
+    newer = (
+        ConversationMessage.objects.filter(conversation_id=conversation_id, id__gt=last_read_id)
+        .exclude(sender=user)
+        .order_by()
+        .values('conversation')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(newer), 0)
+
+
+def record_message(message):
+    """Update the conversation summary and every participant's cursor for a new message"""
+    Conversation.objects.filter(pk=message.conversation_id).update(
+        last_message=message,
+        last_message_preview=message.content[:PREVIEW_LENGTH],
+        last_message_sender=message.sender_id,
+        last_message_at=message.created_at,
+        updated_at=timezone.now()
+    )
+    # Everyone else gains one unread. The sender's cursor only moves past
+    # their own message if they had nothing unread; otherwise the messages
+    # they have not seen yet stay unread
+    ConversationReadCursor.objects.filter(conversation_id=message.conversation_id).update(
+        last_read_id=Case(
+            When(user=message.sender_id, unread_count=0, then=Value(message.id)), default=F('last_read_id'),
+            output_field=BigIntegerField()
+        ),
+        unread_count=Case(When(user=message.sender_id, then=F('unread_count')), default=F('unread_count') + 1),
+        last_message_at=message.created_at
+    )
+
+
+def add_participants(conversation_id, user_ids):
+    """Cursors for new participants: nothing read yet"""
+    conversation = Conversation.objects.filter(pk=conversation_id).values('last_message_at', 'created_at').first()
+    if conversation is None:
+        return
+    ConversationReadCursor.objects.bulk_create(
+        [
+            ConversationReadCursor(
+                conversation_id=conversation_id,
+                user_id=user_id,
+                last_message_at=conversation['last_message_at'] or conversation['created_at'],
+                unread_count=ConversationMessage.objects.filter(conversation_id=conversation_id)
+                .exclude(sender_id=user_id).count()
+            )
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_participants(conversation_id, user_ids=None):
+    cursors = ConversationReadCursor.objects.filter(conversation_id=conversation_id)
+    if user_ids is not None:
+        cursors = cursors.filter(user_id__in=user_ids)
+    cursors.delete()
+
+
+def conversation_list(user):
+    """
+    The user's active conversations, most recent first, each annotated with
+    ``unread_count``; reads the (user, last_message_at) cursor index
+    """
+    return (
+        Conversation.objects.filter(read_cursors__user=user, is_active=True)
+        .annotate(unread_count=F('read_cursors__unread_count'))
+        .select_related('last_message_sender')
+        .prefetch_related('participants')
+        .order_by('-read_cursors__last_message_at', 'read_cursors__id')
+    )
+
+
+def mark_read(conversation, user):
+    """Move the user's cursor to the conversation's latest message"""
+    latest = conversation.last_message_id or 0
+    updated = ConversationReadCursor.objects.filter(conversation=conversation, user=user).update(
+        last_read_id=Greatest(F('last_read_id'), Value(latest, output_field=BigIntegerField())),
+        # Normally 0; counts anything posted since ``conversation`` was loaded
+        unread_count=unread_after(conversation.pk, user, latest)
+    )
+    if not updated:
+        # Not provisioned (e.g. conversations created by bulk_create)
+        ConversationReadCursor.objects.get_or_create(
+            conversation=conversation, user=user,
+            defaults={'last_read_id': latest, 'last_message_at': conversation.last_message_at or conversation.created_at}
+        )
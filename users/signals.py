@@ -1,45 +1,185 @@
 """
-Django signals for automatic UserProfile creation and gamification initialization
+Django signals for automatic UserProfile creation, gamification initialization,
+status snapshot invalidation and messenger bookkeeping
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, StudentPoints, Achievement, StudentAchievement, Notification, Message, Conversation, ConversationMessage, ConversationReadCursor
+from .achievement_rules import invalidate_rule_index
 from .gamification import GamificationManager
+from .leaderboard import Leaderboard
+from . import read_cursors
+from .ranking import PointsRankIndex
+from .status_snapshot import invalidate_user_status, invalidate_staff_status
+from .user_search import index_user, invalidate_recent_contacts
+
+SEARCHABLE_USER_FIELDS = {'username', 'first_name', 'last_name'}
 
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def provision_new_user(sender, instance, created, raw=False, **kwargs):
     """
-    Automatically create UserProfile when a new User is created
+    Create the UserProfile and StudentPoints rows once, when the User is
+    created. Later saves (e.g. the last_login update on every login) cost
+    nothing; users inserted with bulk_create are provisioned with
+    provision_missing_rows instead.
     """
-    if created:
-        UserProfile.objects.create(user=instance)
+    if created and not raw:
+        GamificationManager.provision_user(instance)
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def update_search_terms(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
-    Ensure UserProfile exists and initialize gamification
+    Keep the recipient picker's search terms in step with the user's names
     """
-    # Create UserProfile if it doesn't exist
-    profile, created = UserProfile.objects.get_or_create(user=instance)
-    
-    # Initialize gamification for new users
-    if created or not hasattr(instance, 'points'):
-        GamificationManager.get_or_create_points(instance)
+    if raw or (update_fields is not None and not SEARCHABLE_USER_FIELDS & set(update_fields)):
+        return
+    index_user(instance, created)
 
 
 @receiver(post_save, sender=UserProfile)
-def initialize_gamification(sender, instance, created, **kwargs):
+def invalidate_status_for_profile(sender, instance, **kwargs):
+    """
+    Refresh the navbar snapshot when the user's profile (onboarding flag) changes
+    """
+    invalidate_user_status(instance.user_id)
+
+
+@receiver(post_save, sender=StudentPoints)
+@receiver(post_delete, sender=StudentPoints)
+@receiver(post_save, sender=StudentAchievement)
+@receiver(post_delete, sender=StudentAchievement)
+def invalidate_status_for_student(sender, instance, **kwargs):
+    """
+    Refresh the navbar snapshot when the user's points or badges change
+    """
+    invalidate_user_status(instance.student_id)
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def invalidate_achievement_rules(sender, instance, **kwargs):
+    """
+    Recompile the achievement rule index when the catalog changes
+    """
+    invalidate_rule_index()
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_status_for_notification(sender, instance, **kwargs):
+    invalidate_user_status(instance.user_id)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_status_for_message(sender, instance, **kwargs):
+    invalidate_user_status(instance.sender_id)
+    invalidate_staff_status()
+
+
+@receiver(post_init, sender=StudentPoints)
+def remember_ranked_points(sender, instance, **kwargs):
+    """
+    Remember the total the rank index currently holds for this row
+    """
+    instance._ranked_points = instance.total_points
+
+
+@receiver(post_save, sender=StudentPoints)
+def update_rank_index(sender, instance, created, **kwargs):
+    """
+    Move the student inside the rank index when their total changes
+    """
+    if created:
+        PointsRankIndex.add(instance.total_points)
+    elif instance.total_points != instance._ranked_points:
+        PointsRankIndex.move(instance._ranked_points, instance.total_points)
+    instance._ranked_points = instance.total_points
+
+
+@receiver(post_delete, sender=StudentPoints)
+def remove_from_rank_index(sender, instance, **kwargs):
+    PointsRankIndex.remove(instance._ranked_points)
+
+
+@receiver(post_init, sender=StudentPoints)
+def remember_leaderboard_scores(sender, instance, **kwargs):
+    """
+    Remember the scores the leaderboard currently holds for this row
     """
-    Initialize gamification when UserProfile is created
+    instance._leaderboard_scores = Leaderboard.scores(instance)
+
+
+@receiver(post_save, sender=StudentPoints)
+def update_leaderboard(sender, instance, created, **kwargs):
+    """
+    Keep the materialized leaderboard in step with the student's points
     """
+    scores = Leaderboard.scores(instance)
     if created:
-        # Create default achievements if they don't exist
-        from .gamification import create_default_achievements
-        create_default_achievements()
-        
-        # Initialize points for this user
-        GamificationManager.get_or_create_points(instance.user)
+        if not instance.student.is_staff:
+            Leaderboard.add(instance.student_id, scores)
+    else:
+        Leaderboard.move(instance.student_id, instance._leaderboard_scores, scores)
+    instance._leaderboard_scores = scores
+
+
+@receiver(pre_delete, sender=StudentPoints)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    # pre_delete: the entries must still exist to shift the ranks below them
+    Leaderboard.remove(instance.student_id)
+
+
+@receiver(post_save, sender=User)
+def update_leaderboard_membership(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Staff are never ranked: drop or restore a user's rows when is_staff changes
+    """
+    if created or (update_fields is not None and 'is_staff' not in update_fields):
+        return
+    if instance.is_staff:
+        Leaderboard.remove(instance.pk)
+    else:
+        points_obj = StudentPoints.objects.filter(student=instance).first()
+        if points_obj is not None:
+            Leaderboard.add(instance.pk, Leaderboard.scores(points_obj))
+
+
+@receiver(post_save, sender=ConversationMessage)
+def update_conversation_summary(sender, instance, created, raw=False, **kwargs):
+    """
+    Refresh the conversation's last message and its participants' unread counters
+    """
+    if created and not raw:
+        read_cursors.record_message(instance)
+        invalidate_recent_contacts([instance.sender_id])
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def update_read_cursors(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Give every participant a read cursor, and drop it when they leave;
+    new participants see the conversation among their recent contacts
+    """
+    if action == 'post_add':
+        invalidate_recent_contacts([instance.pk] if reverse else pk_set)
+        if reverse:
+            for conversation_id in pk_set:
+                read_cursors.add_participants(conversation_id, [instance.pk])
+        else:
+            read_cursors.add_participants(instance.pk, pk_set)
+    elif action == 'post_remove':
+        if reverse:
+            for conversation_id in pk_set:
+                read_cursors.remove_participants(conversation_id, [instance.pk])
+        else:
+            read_cursors.remove_participants(instance.pk, pk_set)
+    elif action == 'post_clear':
+        if reverse:
+            ConversationReadCursor.objects.filter(user=instance).delete()
+        else:
+            read_cursors.remove_participants(instance.pk)
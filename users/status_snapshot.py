@@ -0,0 +1,121 @@
+"""
+Cached per-user status snapshot behind the global context processor.
+
+Everything the navbar needs (points, level, rank, badge counts, recent
+notifications) is computed once and cached under a per-user version number.
+Signals bump the version whenever the user's points, achievements,
+notifications or messages change, which orphans the old snapshot; a short
+timeout keeps the rank (which moves when *other* users earn points) fresh.
+
+The version numbers live in the shared cache, so a bump made by the outbox
+worker or another web process is seen everywhere; the snapshots themselves
+stay in each process's local cache, keyed by version.
+"""
+
+import time
+
+from django.core.cache import cache, caches
+from django.db import transaction
+
+SNAPSHOT_TIMEOUT = 60
+
+# Staff see the global unread message count, so any message change bumps this
+STAFF_MESSAGES_VERSION_KEY = 'user_status:staff_messages:version'
+
+DEFAULT_STATUS = {
+    'user_profile': None,
+    'user_points': None,
+    'user_level': 1,
+    'user_total_points': 0,
+    'user_rank': 0,
+    'user_achievements_count': 0,
+    'user_current_streak': 0,
+    'unread_notifications_count': 0,
+    'recent_notifications': [],
+    'unread_messages_count': 0,
+    'show_onboarding': False,
+    'level_progress': {'percentage': 0, 'points_needed': 0},
+}
+
+
+def _user_version_key(user_id):
+    return f'user_status:{user_id}:version'
+
+
+def _get_versions(*keys):
+    shared = caches['shared']
+    versions = shared.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from a timestamp so a lost version key never revives old snapshots
+            shared.add(key, time.time_ns(), None)
+            versions[key] = shared.get(key, 0)
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    # A fresh timestamp rather than incr: one write, and no read-modify-write
+    # for concurrent processes to race on
+    caches['shared'].set(key, time.time_ns(), None)
+
+
+def invalidate_user_status(user_id):
+    """Discard a user's cached snapshot once the current transaction commits"""
+    key = _user_version_key(user_id)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def invalidate_staff_status():
+    """Discard every staff snapshot (their unread count covers all messages)"""
+    transaction.on_commit(lambda: _bump(STAFF_MESSAGES_VERSION_KEY))
+
+
+def compute_user_status(user):
+    """Build the status snapshot straight from the database"""
+    from .gamification import GamificationManager
+    from .models import Notification, UserProfile, Message
+
+    profile, created = UserProfile.objects.get_or_create(user=user)
+    points_obj = GamificationManager.get_or_create_points(user)
+    user_stats = GamificationManager.get_user_stats(user)
+
+    if user.is_staff:
+        unread_messages_count = Message.objects.filter(is_read=False).count()
+    else:
+        unread_messages_count = Message.objects.filter(sender=user, is_read=False).count()
+
+    return {
+        'user_profile': profile,
+        'user_points': points_obj,
+        'user_level': points_obj.level,
+        'user_total_points': points_obj.total_points,
+        'user_rank': user_stats.get('rank', 0),
+        'user_achievements_count': user_stats.get('achievements_count', 0),
+        'user_current_streak': points_obj.current_streak,
+        'unread_notifications_count': Notification.objects.filter(user=user, is_read=False).count(),
+        'recent_notifications': list(Notification.objects.filter(user=user).order_by('-created_at')[:3]),
+        'unread_messages_count': unread_messages_count,
+        'show_onboarding': profile.show_onboarding,
+        'level_progress': user_stats.get('progress_to_next_level', {
+            'percentage': 0,
+            'points_needed': 0
+        }),
+    }
+
+
+def get_user_status(user):
+    """Return the user's status snapshot, rebuilding it only when stale"""
+    try:
+        version_keys = [_user_version_key(user.pk)]
+        if user.is_staff:
+            version_keys.append(STAFF_MESSAGES_VERSION_KEY)
+        key = 'user_status:' + ':'.join(str(part) for part in [user.pk, *_get_versions(*version_keys)])
+
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = compute_user_status(user)
+            cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+        return snapshot
+    except Exception:
+        # Never let the navbar take a page down
+        return DEFAULT_STATUS
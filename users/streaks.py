@@ -0,0 +1,65 @@
+"""
+Streak engine for AskUP
+Pure, non-recursive streak arithmetic plus the ledger that makes streak
+bonuses idempotent: a bonus is only ever granted once per student per day.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from .models import StreakBonusGrant
+
+StreakUpdate = namedtuple('StreakUpdate', ['current_streak', 'is_new_day'])
+
+
+class StreakEngine:
+    """Streak transitions and the bonus ledger"""
+
+    @classmethod
+    def advance(cls, last_activity_date, current_streak, today):
+        """Streak after an activity on ``today``"""
+        if last_activity_date == today:
+            return StreakUpdate(current_streak, False)
+        if last_activity_date == today - timedelta(days=1):
+            return StreakUpdate(current_streak + 1, True)
+        return StreakUpdate(1, True)
+
+    @classmethod
+    def bonus_type(cls, current_streak):
+        """Bonus activity for the first activity of a streak day"""
+        if current_streak % 7 == 0:  # Weekly streak
+            return 'weekly_streak'
+        elif current_streak % 30 == 0:  # Monthly streak
+            return 'monthly_streak'
+        return 'daily_streak'  # Daily activity
+
+    @classmethod
+    def summarize(cls, dates, today):
+        """
+        Return (current_streak, longest_streak, last_activity_date) for a
+        sorted iterable of activity dates. The current streak is 0 once the
+        last activity is older than yesterday.
+        """
+        longest = run = 0
+        previous = None
+        for day in dates:
+            if previous is not None and day == previous:
+                continue
+            run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+            longest = max(longest, run)
+            previous = day
+
+        if previous is None or previous < today - timedelta(days=1):
+            return 0, longest, previous
+        return run, longest, previous
+
+    @classmethod
+    def claim_bonus(cls, user, day, bonus_type, points):
+        """Record a bonus in the ledger; False if one was already granted for ``day``"""
+        try:
+            with transaction.atomic():
+                StreakBonusGrant.objects.create(student=user, date=day, bonus_type=bonus_type, points=points)
+        except IntegrityError:
+            return False
+        return True
@@ -1,8 +1,53 @@
-from django.test import TestCase
+import random
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank
+from django.test import TestCase, TransactionTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.core.cache import cache, caches
 from django.urls import reverse
+from django.utils import timezone
+
+from .activity_log import activity_counts, compact
+from .context_processors import user_status_data
+from .achievement_rules import get_rule_index
+from .gamification import GamificationManager, create_default_achievements
+from .leaderboard import CATEGORIES, Leaderboard
+from .read_cursors import conversation_list
+from .models import Achievement, AchievementProgress, Conversation, ConversationMessage, LeaderboardEntry, LearningStreak, PointsTransaction, UserProfile, Notification, StreakBonusGrant, StudentActivity, StudentActivityRollup, StudentPoints
+from .ranking import PointsRankIndex
+from .streaks import StreakEngine
+
+
+class LeaderboardAssertions:
+    def assertMatchesRebuild(self):
+        """
+        Board ranks, looked up one by one and paged, agree with DENSE_RANK()
+        over the points rows, and percentiles with a count of the board
+        """
+        for category, field in CATEGORIES.items():
+            fresh = dict(
+                StudentPoints.objects.filter(student__is_staff=False)
+                .annotate(dense_rank=Window(DenseRank(), order_by=F(field).desc()))
+                .values_list('student_id', 'dense_rank')
+            )
+            ranked = LeaderboardEntry.objects.filter(category=category).values_list('student_id', flat=True)
+            stored = {student_id: Leaderboard.rank(student_id, category) for student_id in ranked}
+            self.assertEqual(stored, fresh, category)
+            paged = {entry.student_id: entry.rank for entry in Leaderboard.top(category, None)}
+            self.assertEqual(paged, fresh, category)
+            entries = list(LeaderboardEntry.objects.filter(category=category))
+            for entry in entries:
+                below = sum(other.score < entry.score for other in entries)
+                self.assertAlmostEqual(Leaderboard.percentile(entry), below / len(entries) * 100, msg=category)
 
-class UserAuthTestCase(TestCase):
+
+class UserAuthTestCase(LeaderboardAssertions, TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
             username='testuser',
@@ -24,3 +69,563 @@ class UserAuthTestCase(TestCase):
             'password': 'testpass123'
         })
         self.assertEqual(response.status_code, 302)  # Redirect after login
+
+    def test_new_user_is_provisioned_once(self):
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+        self.assertTrue(StudentPoints.objects.filter(student=self.user).exists())
+        self.assertEqual(Achievement.objects.count(), 8)  # Seeded by migration
+
+        # The last_login update on login is a single UPDATE
+        with CaptureQueriesContext(connection) as queries:
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(len(queries), 1)
+
+        # Signing up registers the points row on every board in bulk
+        with CaptureQueriesContext(connection) as queries:
+            other = User.objects.create_user(username='other', password='testpass123')
+        self.assertLessEqual(len(queries), 14)
+        self.assertEqual(LeaderboardEntry.objects.filter(student=other).count(), len(CATEGORIES))
+        self.assertMatchesRebuild()
+
+
+class UserStatusSnapshotTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_values_are_lazy(self):
+        with self.assertNumQueries(0):
+            user_status_data(self.request)
+
+    def test_snapshot_is_cached_and_invalidated(self):
+        self.assertEqual(user_status_data(self.request)['unread_notifications_count'], 0)
+        with self.assertNumQueries(1):  # The version from the shared cache
+            self.assertEqual(user_status_data(self.request)['unread_notifications_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title='Hi', message='Hello', notification_type='system_update')
+        context = user_status_data(self.request)
+        self.assertEqual(context['unread_notifications_count'], 1)
+        self.assertEqual(len(context['recent_notifications']), 1)
+
+    def test_version_bumped_by_another_process(self):
+        self.assertEqual(user_status_data(self.request)['unread_notifications_count'], 0)
+        # bulk_create skips the signals, so only the other process's bump can
+        # orphan the snapshot; a separate cache connection stands in for it
+        Notification.objects.bulk_create([
+            Notification(user=self.user, title='Hi', message='Hello', notification_type='system_update')
+        ])
+        other_process = caches.create_connection('shared')
+        key = f'user_status:{self.user.pk}:version'
+        other_process.set(key, other_process.get(key) + 1, None)
+
+        self.assertEqual(user_status_data(self.request)['unread_notifications_count'], 1)
+
+
+class PointsRankIndexTestCase(TestCase):
+    def test_rank_matches_count_with_ties(self):
+        totals = [0, 5, 5, 12, 40, 40, 40, 300]
+        for i, total in enumerate(totals):
+            user = User.objects.create_user(username=f'student{i}', password='testpass123')
+            StudentPoints.objects.filter(student=user).update(total_points=total)
+        PointsRankIndex.rebuild()
+
+        # Moving through a save keeps the index in sync
+        points = StudentPoints.objects.get(student__username='student0')
+        points.total_points = 41
+        points.save()
+
+        for total in set(StudentPoints.objects.values_list('total_points', flat=True)):
+            higher = StudentPoints.objects.filter(total_points__gt=total).count()
+            lower = StudentPoints.objects.filter(total_points__lt=total).count()
+            rank, percentile = PointsRankIndex.lookup(total)
+            self.assertEqual(rank, higher + 1)
+            self.assertAlmostEqual(percentile, lower / len(totals) * 100)
+
+
+class AwardPointsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_award_is_a_single_points_write(self):
+        GamificationManager.award_points(self.user, 'question_asked')
+        with CaptureQueriesContext(connection) as queries:
+            result = GamificationManager.award_points(self.user, 'answer_given')
+
+        writes = [q for q in queries if q['sql'].startswith('UPDATE "users_studentpoints"')]
+        self.assertEqual(len(writes), 1)
+
+        points = StudentPoints.objects.get(student=self.user)
+        # Both awards plus a single daily streak bonus for today
+        self.assertEqual(points.questions_points, 5)
+        self.assertEqual(points.answers_points, 10)
+        self.assertEqual(points.consistency_points, 5)
+        self.assertEqual(points.total_points, 20)
+        self.assertEqual(points.current_streak, 1)
+        self.assertEqual(result['total_points'], 20)
+
+    def test_level_is_computed_in_sql(self):
+        result = GamificationManager.award_points(self.user, 'helpful_answer', 395)
+        self.assertTrue(result['level_up'])
+        self.assertEqual(result['new_level'], 3)
+        self.assertEqual(StudentPoints.objects.get(student=self.user).level, 3)
+
+
+class StreakEngineTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_summarize(self):
+        today = date(2024, 3, 10)
+        days = [date(2024, 3, d) for d in (1, 2, 3, 3, 4, 8, 9, 10)]
+        self.assertEqual(StreakEngine.summarize(days, today), (3, 4, today))
+        self.assertEqual(StreakEngine.summarize(days[:5], today), (0, 4, date(2024, 3, 4)))
+        self.assertEqual(StreakEngine.summarize([], today), (0, 0, None))
+
+    def test_bonus_granted_once_per_day(self):
+        GamificationManager.award_points(self.user, 'question_asked')
+        # Even if the streak columns are reset, the ledger blocks a second bonus
+        StudentPoints.objects.filter(student=self.user).update(last_activity_date=None)
+        GamificationManager.award_points(self.user, 'question_asked')
+
+        self.assertEqual(StreakBonusGrant.objects.filter(student=self.user).count(), 1)
+        self.assertEqual(StudentPoints.objects.get(student=self.user).consistency_points, 5)
+
+    def test_backfill_from_learning_streaks(self):
+        today = date.today()
+        for offset in (0, 1, 2, 5, 6):
+            LearningStreak.objects.create(student=self.user, date=today - timedelta(days=offset))
+        StudentPoints.objects.filter(student=self.user).update(current_streak=40, longest_streak=40)
+
+        call_command('backfill_streaks', stdout=StringIO())
+
+        points = StudentPoints.objects.get(student=self.user)
+        self.assertEqual((points.current_streak, points.longest_streak), (3, 3))
+        self.assertEqual(points.last_activity_date, today)
+
+
+class AchievementRuleIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_default_achievements()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_only_crossed_rules_are_evaluated(self):
+        result = GamificationManager.award_points(self.user, 'question_asked')
+        self.assertEqual([a.name for a in result['new_achievements']], ['First Question'])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = GamificationManager.award_points(self.user, 'question_asked')
+        self.assertEqual(result['new_achievements'], [])
+        # Only the progress upsert touches achievement tables
+        self.assertFalse([
+            q for q in queries
+            if ('"users_achievement"' in q['sql'] or '"users_studentachievement"' in q['sql'])
+        ])
+
+    def test_progress_tracks_only_affected_rules(self):
+        GamificationManager.award_points(self.user, 'question_asked')
+        consistency = AchievementProgress.objects.get(student=self.user, achievement__name='Consistent Learner')
+
+        GamificationManager.award_points(self.user, 'question_asked')
+
+        progress = {row.achievement.name: row for row in GamificationManager.get_achievement_progress(self.user)}
+        self.assertEqual(list(progress)[:2], ['Curious Mind', 'Consistent Learner'])
+        self.assertEqual((progress['Curious Mind'].value, progress['Curious Mind'].percentage), (10, 20))
+        self.assertNotIn('First Question', progress)  # Earned
+        # The consistency column did not change on the second award
+        self.assertEqual(progress['Consistent Learner'].updated_at, consistency.updated_at)
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('gamification_dashboard'))
+        self.assertContains(response, '20% to Curious Mind')
+
+    def test_backfill_awards_existing_qualifiers(self):
+        GamificationManager.award_points(self.user, 'helpful_answer', 60)
+        other = User.objects.create_user(username='other')
+        rising = Achievement.objects.create(name='Rising Star', description='Earned 50 points',
+                                            points_required=50, category='community')
+
+        output = StringIO()
+        call_command('backfill_achievements', rising.id, workers=1, partition_size=1, stdout=output)
+
+        self.assertIn('Awarded 1 achievements', output.getvalue())
+        self.assertTrue(self.user.achievements.filter(achievement=rising).exists())
+        self.assertFalse(other.achievements.filter(achievement=rising).exists())
+        progress = AchievementProgress.objects.get(student=self.user, achievement=rising)
+        self.assertEqual((progress.value, progress.target), (50, 50))
+        # Running it again is a no-op
+        call_command('backfill_achievements', rising.id, workers=1, stdout=output)
+        self.assertEqual(rising.studentachievement_set.count(), 1)
+
+    def test_catalog_changes_recompile_the_index(self):
+        self.assertEqual(len(get_rule_index()), 8)
+        Achievement.objects.create(name='Rising Star', description='Earned 20 points',
+                                   points_required=20, category='community')
+        self.assertEqual(len(get_rule_index()), 9)
+
+    def test_catalog_version_bumped_by_another_process(self):
+        self.assertEqual(len(get_rule_index()), 8)
+        # bulk_create skips the signals; a separate cache connection stands in
+        # for the process that changed the catalog and bumped the version
+        Achievement.objects.bulk_create([
+            Achievement(name='Rising Star', description='Earned 20 points', points_required=20, category='community')
+        ])
+        self.assertEqual(len(get_rule_index()), 8)
+        caches.create_connection('shared').set('achievement_rules:version', 0, None)
+        self.assertEqual(len(get_rule_index()), 9)
+
+        result = GamificationManager.award_points(self.user, 'helpful_answer')
+        self.assertIn('Rising Star', [a.name for a in result['new_achievements']])
+
+
+class AchievementBackfillWorkersTestCase(TransactionTestCase):
+    # Workers (threads on the in-memory test database) only see committed
+    # rows; keep the seeded catalog for later tests
+    serialized_rollback = True
+
+    def test_backfill_across_workers(self):
+        students = [User.objects.create_user(username=f'student{i}') for i in range(6)]
+        for student in students[::2]:
+            GamificationManager.award_points(student, 'helpful_answer', 60)
+        rising = Achievement.objects.create(name='Rising Star', description='Earned 50 points',
+                                            points_required=50, category='community')
+
+        output = StringIO()
+        call_command('backfill_achievements', rising.id, workers=2, partition_size=2, stdout=output)
+
+        self.assertIn('Awarded 3 achievements', output.getvalue())
+        self.assertEqual(set(rising.studentachievement_set.values_list('student_id', flat=True)),
+                         {student.id for student in students[::2]})
+        self.assertEqual(AchievementProgress.objects.filter(achievement=rising).count(), 3)
+
+
+class QueryPlanBenchmarkTestCase(TestCase):
+    def test_benchmark_runs_on_small_seed_and_rolls_back(self):
+        output = StringIO()
+        call_command('benchmark_query_plans', users=10, questions=200, repeat=1, stdout=output)
+        self.assertIn('conversation unread', output.getvalue())
+        self.assertIn('0 of 10 queries full-scan a table', output.getvalue())
+        self.assertFalse(User.objects.exists())
+
+
+class LeaderboardTestCase(LeaderboardAssertions, TestCase):
+    def setUp(self):
+        self.students = [User.objects.create_user(username=f'student{i}') for i in range(12)]
+        self.admin = User.objects.create_user(username='admin', is_staff=True)
+
+    def test_incremental_ranks_match_rebuild(self):
+        rng = random.Random(7)
+        activities = ['question_asked', 'answer_given', 'helpful_answer']
+        for _ in range(60):
+            student = rng.choice(self.students + [self.admin])
+            GamificationManager.award_points(student, rng.choice(activities), rng.choice([None, -4, 3, 25]))
+        self.assertMatchesRebuild()
+
+        self.students[0].delete()
+        self.assertMatchesRebuild()
+
+    def test_around_me_window(self):
+        for i, student in enumerate(self.students):
+            GamificationManager.award_points(student, 'helpful_answer', (i + 1) * 10)
+        me = self.students[5]
+        me.set_password('testpass123')
+        me.save()
+        self.client.login(username=me.username, password='testpass123')
+
+        data = self.client.get(reverse('leaderboard_around_me'), {'n': 2}).json()
+        self.assertEqual(data['rank'], 7)
+        self.assertEqual([row['rank'] for row in data['window']], [5, 6, 7, 8, 9])
+        self.assertTrue(data['window'][2]['is_me'])
+        # Five of the twelve ranked students are below; staff are not on the board
+        self.assertAlmostEqual(data['percentile'], 5 / 12 * 100, places=1)
+
+        # The percentile reads the students tree, never the board itself
+        entry = LeaderboardEntry.objects.get(category='total', student=me)
+        with CaptureQueriesContext(connection) as queries:
+            Leaderboard.percentile(entry)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('users_leaderboardentry', queries[0]['sql'])
+
+    def test_leaderboard_page_shows_board_rank(self):
+        for student, points in zip(self.students[:3], (50, 50, 20)):
+            GamificationManager.award_points(student, 'helpful_answer', points)
+        GamificationManager.award_points(self.admin, 'helpful_answer', 999)
+        me = self.students[2]
+        me.set_password('testpass123')
+        me.save()
+        self.client.login(username=me.username, password='testpass123')
+
+        # Dense rank among students: the admin and the tie above count once
+        response = self.client.get(reverse('leaderboard'))
+        self.assertEqual(response.context['user_rank'], 2)
+        self.assertContains(response, '#2</div>')
+        response = self.client.get(reverse('leaderboard'), {'window': 'week'})
+        self.assertIsNone(response.context['user_rank'])
+        self.assertNotContains(response, 'Your Rank')
+
+    def test_time_windows_sum_daily_rollups(self):
+        today = date(2025, 10, 15)
+        a, b, c = self.students[:3]
+        for student, days_ago, points in [(a, 0, 10), (a, 20, 100), (b, 3, 30), (c, 6, 10), (c, 8, 50),
+                                          (self.admin, 1, 999)]:
+            LearningStreak.objects.create(student=student, date=today - timedelta(days=days_ago),
+                                          points_earned=points)
+
+        week = Leaderboard.top_window('week', today=today)
+        self.assertEqual([(e.student, e.score, e.rank) for e in week], [(b, 30, 1), (a, 10, 2), (c, 10, 2)])
+        month = Leaderboard.top_window('month', today=today)
+        self.assertEqual([e.student for e in month], [a, c, b])
+
+        with self.settings(LEADERBOARD_TERM_START='2025-10-01'):
+            term = Leaderboard.top_window('term', today=today)
+        self.assertEqual([(e.student, e.score) for e in term], [(c, 60), (b, 30), (a, 10)])
+
+    def test_staff_are_not_ranked(self):
+        GamificationManager.award_points(self.admin, 'helpful_answer', 500)
+        self.assertNotIn(self.admin, [entry.student for entry in GamificationManager.get_leaderboard()])
+
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(GamificationManager.get_leaderboard()[0].student, self.admin)
+        self.assertMatchesRebuild()
+
+
+class GamificationBootstrapTestCase(LeaderboardAssertions, TestCase):
+    def test_missing_rows_are_created_in_chunks(self):
+        users = [User.objects.create_user(username=f'student{i}') for i in range(7)]
+        staff = User.objects.create_user(username='admin', is_staff=True)
+        GamificationManager.award_points(users[0], 'helpful_answer')
+        UserProfile.objects.filter(user__in=users[1:4]).delete()
+        StudentPoints.objects.filter(student__in=users[2:6] + [staff]).delete()
+
+        output = StringIO()
+        call_command('fix_userprofiles', batch_size=3, stdout=output)
+
+        self.assertIn('Created 3 new UserProfiles', output.getvalue())
+        self.assertIn('8/8 users checked', output.getvalue())
+        self.assertEqual(UserProfile.objects.count(), 8)
+        self.assertEqual(StudentPoints.objects.count(), 8)
+        # The rank index and the board saw the bulk-created rows
+        self.assertEqual(PointsRankIndex.lookup(0), (2, 0))
+        self.assertMatchesRebuild()
+
+
+class PointsLedgerTestCase(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'student{i}') for i in range(4)]
+
+    def snapshot(self):
+        return list(StudentPoints.objects.order_by('student_id').values_list(
+            'student_id', 'total_points', 'level', 'questions_points', 'answers_points',
+            'helping_points', 'consistency_points'
+        ))
+
+    def test_replay_rebuilds_the_projection(self):
+        rng = random.Random(3)
+        for _ in range(40):
+            GamificationManager.award_points(
+                rng.choice(self.users[:3]), rng.choice(['question_asked', 'helpful_answer', 'question_deleted']),
+                rng.choice([None, -3, 150])
+            )
+        expected = self.snapshot()
+
+        StudentPoints.objects.update(total_points=999, level=9, questions_points=7, consistency_points=0)
+        call_command('replay_points_ledger', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(StudentPoints.objects.get(student=self.users[3]).total_points, 0)
+
+    def test_idempotency_key_applies_once(self):
+        first = GamificationManager.award_points(self.users[0], 'question_asked', idempotency_key='q:1')
+        again = GamificationManager.award_points(self.users[0], 'question_asked', idempotency_key='q:1')
+
+        self.assertTrue(again['duplicate'])
+        self.assertEqual(again['total_points'], first['total_points'])
+        self.assertEqual(PointsTransaction.objects.filter(activity_type='question_asked').count(), 1)
+
+    def test_ledger_is_append_only(self):
+        GamificationManager.award_points(self.users[0], 'question_asked')
+        entry = PointsTransaction.objects.first()
+        entry.points = 1000
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+
+class ActivityCompactionTestCase(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student')
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        now = timezone.now()
+        for age, activity_type in [(100, 'question_asked'), (100, 'question_asked'), (100, 'answer_given'),
+                                   (95, 'question_asked'), (20, 'question_asked'), (0, 'answer_given')]:
+            activity = StudentActivity.objects.create(student=self.student, activity_type=activity_type,
+                                                      description='')
+            StudentActivity.objects.filter(pk=activity.pk).update(timestamp=now - timedelta(days=age))
+
+    def test_compaction_preserves_counts(self):
+        since = timezone.localdate() - timedelta(days=120)
+        before = activity_counts(since, self.student)
+
+        call_command('compact_activity', days=90, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(StudentActivity.objects.count(), 2)
+        self.assertEqual(
+            sorted(StudentActivityRollup.objects.values_list('activity_type', 'count')),
+            [('answer_given', 1), ('question_asked', 1), ('question_asked', 2)]
+        )
+        self.assertEqual(activity_counts(since, self.student), before)
+        # Rerunning folds nothing more
+        self.assertEqual(compact(days=90), 0)
+
+    def test_admin_dashboard_reads_rollups(self):
+        StudentActivity.objects.filter(activity_type='answer_given').update(timestamp=timezone.now() - timedelta(days=10))
+        compact(days=5)
+
+        self.client.login(username='admin', password='testpass123')
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(dict(response.context['activity_summary']), {'Question Asked': 1, 'Answer Given': 2})
+
+
+class MessengerTestCase(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'member{i}', password='testpass123') for i in range(3)]
+        self.conversation = Conversation.objects.create(title='Study group', conversation_type='study_group',
+                                                        created_by=self.users[0])
+        self.conversation.participants.add(*self.users)
+
+    def post(self, sender, count=1):
+        for i in range(count):
+            ConversationMessage.objects.create(conversation=self.conversation, sender=sender, content=f'hi {i}')
+
+    def unread(self):
+        return [self.conversation.get_unread_count(user) for user in self.users]
+
+    def test_read_cursors_are_per_participant(self):
+        self.post(self.users[0], 3)
+        self.assertEqual(self.unread(), [0, 3, 3])
+
+        self.client.login(username='member1', password='testpass123')
+        response = self.client.get(reverse('conversation_detail', args=[self.conversation.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(), [0, 0, 3])
+
+        # Posting does not mark the sender's unread messages as read
+        self.post(self.users[2])
+        self.assertEqual(self.unread(), [1, 1, 3])
+        # but a caught-up sender stays caught up
+        self.client.get(reverse('conversation_detail', args=[self.conversation.id]))
+        self.post(self.users[1])
+        self.assertEqual(self.unread(), [2, 0, 4])
+        sidebar = {conv.id: conv.unread_count for conv in response.context['conversations']}
+        self.assertEqual(sidebar, {self.conversation.id: 0})
+
+    def test_marking_read_cost_does_not_grow_with_unread_messages(self):
+        self.client.login(username='member1', password='testpass123')
+        url = reverse('conversation_detail', args=[self.conversation.id])
+
+        self.client.get(url)  # Creates the cursor and warms the navbar snapshot
+        self.post(self.users[0], 2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self.post(self.users[0], 40)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(self.unread()[1], 0)
+
+    def test_history_pages_by_message_id(self):
+        self.post(self.users[0], 120)
+        self.client.login(username='member1', password='testpass123')
+        url = reverse('conversation_detail', args=[self.conversation.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        ids = list(self.conversation.messages.order_by('id').values_list('id', flat=True))
+        self.assertEqual([m.id for m in response.context['messages']], ids[-50:])
+        self.assertEqual(response.context['older_cursor'], ids[-50])
+        self.assertFalse([q for q in queries if 'COUNT(*)' in q['sql'] and 'users_conversationmessage' in q['sql']])
+        self.assertFalse([q for q in queries if 'OFFSET' in q['sql']])
+
+        response = self.client.get(url, {'before': ids[-50]})
+        self.assertEqual([m.id for m in response.context['messages']], ids[-100:-50])
+        response = self.client.get(url, {'before': ids[-100]})
+        self.assertEqual([m.id for m in response.context['messages']], ids[:20])
+        self.assertIsNone(response.context['older_cursor'])
+
+        # Polling shares the cursor: bounded pages above the last id seen
+        api = reverse('get_conversation_messages', args=[self.conversation.id])
+        data = self.client.post(api, {'last_message_id': ids[9]}).json()
+        self.assertEqual([m['id'] for m in data['messages']], ids[10:60])
+        self.assertTrue(data['has_more'])
+        data = self.client.post(api, {'last_message_id': ids[-1]}).json()
+        self.assertEqual((data['messages'], data['has_more']), ([], False))
+        data = self.client.post(api, {'before': ids[-50]}).json()
+        self.assertEqual([m['id'] for m in data['messages']], ids[-100:-50])
+        self.assertEqual(data['older_cursor'], ids[-100])
+
+    def test_recipient_picker_searches_by_prefix(self):
+        User.objects.create_user(username='zoe', first_name='Ann', last_name='Lee', password='testpass123')
+        User.objects.create_user(username='annex', password='testpass123', is_active=False)
+        self.client.login(username='member0', password='testpass123')
+        url = reverse('search_users')
+
+        response = self.client.get(reverse('messenger_home'))
+        self.assertNotContains(response, 'zoe')
+        self.assertEqual([u['username'] for u in self.client.get(url, {'q': 'AN'}).json()['users']], ['zoe'])
+        self.assertEqual([u['username'] for u in self.client.get(url, {'q': 'ann le'}).json()['users']], ['zoe'])
+        self.assertEqual(self.client.get(url, {'q': 'nn'}).json()['users'], [])
+
+        # Renaming re-indexes the user
+        zoe = User.objects.get(username='zoe')
+        zoe.first_name = 'Zed'
+        zoe.save()
+        self.assertEqual(self.client.get(url, {'q': 'ann'}).json()['users'], [])
+
+        # An empty query suggests recent contacts, most recent conversation first
+        data = self.client.get(url).json()
+        self.assertTrue(data['recent'])
+        self.assertEqual([u['username'] for u in data['users']], ['member1', 'member2'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('start_conversation'), {'recipient_id': zoe.id, 'content': 'hello'})
+        self.assertEqual([u['username'] for u in self.client.get(url).json()['users']], ['zoe', 'member1', 'member2'])
+        with self.assertNumQueries(3):  # Session, user and one shared cache read for the contacts
+            self.client.get(url)
+
+    def test_conversation_list_reads_summaries(self):
+        other = Conversation.objects.create(title='Other', created_by=self.users[1])
+        other.participants.add(self.users[0], self.users[1])
+        self.post(self.users[0], 2)
+        ConversationMessage.objects.create(conversation=other, sender=self.users[1], content='newest')
+
+        conversations = list(conversation_list(self.users[0]))
+        self.assertEqual([conv.id for conv in conversations], [other.id, self.conversation.id])
+        self.assertEqual([conv.unread_count for conv in conversations], [1, 0])
+        self.assertEqual(conversations[0].last_message_preview, 'newest')
+        self.assertEqual(conversations[0].last_message_sender, self.users[1])
+
+        self.client.login(username='member0', password='testpass123')
+        self.client.get(reverse('messenger_home'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('messenger_home'))
+        self.assertContains(response, 'newest')
+        self.assertFalse([q for q in queries if 'MAX(' in q['sql'] or 'users_conversationmessage' in q['sql']])
+
+    def test_direct_messages_reuse_one_conversation_per_pair(self):
+        alice, bob = self.users[0], self.users[1]
+        self.client.login(username='member0', password='testpass123')
+        self.client.post(reverse('start_conversation'), {'recipient_id': bob.id, 'content': 'hello'})
+        self.client.login(username='member1', password='testpass123')
+        self.client.post(reverse('start_conversation'), {'recipient_id': alice.id, 'content': 'hi back'})
+
+        direct = Conversation.objects.get(conversation_type='direct_message')
+        self.assertEqual(direct.direct_key, f'{alice.id}:{bob.id}')
+        self.assertEqual(direct.messages.count(), 2)
+        self.assertEqual(set(direct.participants.all()), {alice, bob})
+        self.assertEqual(Conversation.get_or_create_direct(bob, alice, 'again'), (direct, False))
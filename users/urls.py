@@ -41,6 +41,7 @@ urlpatterns = [
     # Gamification URLs
     path('progress/', views.gamification_dashboard, name='gamification_dashboard'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('leaderboard/around-me/', views.leaderboard_around_me, name='leaderboard_around_me'),
     path('notifications/', views.notifications_list, name='notifications_list'),
     path('notifications/json/', views.get_notifications_json, name='get_notifications_json'),
     path('notifications/mark-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
@@ -0,0 +1,109 @@
+"""
+Recipient search for the messenger's new-conversation picker.
+
+Every user is indexed under a few lowercased terms (username, first name, last
+name and full name) in UserSearchTerm, so a typeahead query is a short range
+scan on the (term, user) index rather than a LIKE '%...%' over the whole User
+table. With an empty query the picker offers the user's recent contacts,
+which are cached per user for a few minutes in the shared cache, so an
+invalidation made by one process reaches every other.
+"""
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import ConversationReadCursor, UserSearchTerm
+
+SEARCH_RESULTS_LIMIT = 10
+RECENT_CONTACTS_LIMIT = 8
+RECENT_CONTACTS_TIMEOUT = 300
+MIN_QUERY_LENGTH = 2
+
+# Sorts after every character, closing the range of terms that start with a prefix
+_PREFIX_END = '\U0010ffff'
+
+
+def search_terms(username, first_name, last_name):
+    """The terms a user with these names is found by"""
+    full_name = f'{first_name} {last_name}'.strip()
+    return {term.lower() for term in (username, first_name, last_name, full_name) if term}
+
+
+def index_user(user, created=False):
+    """Bring the user's search terms in line with their current names"""
+    terms = search_terms(user.username, user.first_name, user.last_name)
+    existing = set() if created else set(UserSearchTerm.objects.filter(user=user).values_list('term', flat=True))
+    if existing == terms:
+        return
+    if existing - terms:
+        UserSearchTerm.objects.filter(user=user, term__in=existing - terms).delete()
+    UserSearchTerm.objects.bulk_create(
+        [UserSearchTerm(user=user, term=term) for term in terms - existing], ignore_conflicts=True
+    )
+
+
+def user_data(user):
+    """The JSON shape the picker renders"""
+    return {
+        'id': user.id,
+        'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'username': user.username,
+        'is_staff': user.is_staff
+    }
+
+
+def find_recipients(user, query, limit=SEARCH_RESULTS_LIMIT):
+    """Active users other than ``user`` with a name starting with ``query``, in name order"""
+    prefix = query.strip().lower()
+    if len(prefix) < MIN_QUERY_LENGTH:
+        return []
+
+    matches = (
+        UserSearchTerm.objects.filter(term__gte=prefix, term__lt=prefix + _PREFIX_END, user__is_active=True)
+        .exclude(user=user)
+        .select_related('user')
+        .order_by('term', 'user')
+    )
+    # A user matching several terms ("ann", "ann lee") is listed once
+    found = {}
+    for match in matches[:limit * 4]:
+        found.setdefault(match.user_id, match.user)
+        if len(found) == limit:
+            break
+    return [user_data(match) for match in found.values()]
+
+
+def _recent_contacts_key(user_id):
+    return f'messenger:recent_contacts:{user_id}'
+
+
+def recent_contacts(user, limit=RECENT_CONTACTS_LIMIT):
+    """The people from the user's most recently active conversations, cached"""
+    cache = caches['shared']
+    key = _recent_contacts_key(user.pk)
+    contacts = cache.get(key)
+    if contacts is None:
+        conversation_ids = list(
+            ConversationReadCursor.objects.filter(user=user)
+            .order_by('-last_message_at')
+            .values_list('conversation_id', flat=True)[:limit]
+        )
+        rank = {conversation_id: i for i, conversation_id in enumerate(conversation_ids)}
+        cursors = sorted(
+            ConversationReadCursor.objects.filter(conversation_id__in=conversation_ids, user__is_active=True)
+            .exclude(user=user)
+            .select_related('user'),
+            key=lambda cursor: rank[cursor.conversation_id]
+        )
+        found = {}
+        for cursor in cursors:
+            found.setdefault(cursor.user_id, cursor.user)
+        contacts = [user_data(contact) for contact in list(found.values())[:limit]]
+        cache.set(key, contacts, RECENT_CONTACTS_TIMEOUT)
+    return contacts
+
+
+def invalidate_recent_contacts(user_ids):
+    """Drop the cached contacts of these users once the current transaction commits"""
+    keys = [_recent_contacts_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: caches['shared'].delete_many(keys))
@@ -14,12 +14,16 @@ from django.utils.text import Truncator
 from django.utils.timesince import timesince
 from django.core.paginator import Paginator
 from django.conf import settings
+from datetime import timedelta
 from .forms import (
     SignUpForm, AdminSignUpForm, ProfileUpdateForm, SecuritySettingsForm,
     CustomPasswordChangeForm, ThemePreferenceForm, NotificationSettingsForm,
     MessageForm, MessageReplyForm
 )
+from .activity_log import activity_counts
 from .gamification import GamificationManager
+from .leaderboard import MAX_WINDOW, WINDOWS as LEADERBOARD_WINDOWS, Leaderboard
+from .status_snapshot import invalidate_user_status
 
 # Import enhanced messaging views
 from .messaging_views import (
@@ -167,22 +171,24 @@ def admin_signup(request):
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     from qna.models import Question, Answer
+    from qna.community_stats import get_community_stats
     
-    # Get statistics
-    total_questions = Question.objects.count()
-    total_answers = Answer.objects.count()
-    total_users = User.objects.filter(is_staff=False).count()
-    total_admins = User.objects.filter(is_staff=True).count()
+    # Get statistics (served from the cached community counters)
+    stats = get_community_stats()
+    total_questions = stats['total_questions']
+    total_answers = stats['total_answers']
+    total_users = stats['total_students']
+    total_admins = stats['total_admins']
     
-    # Get recent questions with prefetch to avoid slicing issues
-    recent_questions = Question.objects.select_related('author').prefetch_related('answers').order_by('-created_at')[:10]
+    # Get recent questions (answer counts are stored on the row)
+    recent_questions = Question.objects.select_related('author').order_by('-created_at')[:10]
     
     # Get recent users
     recent_users = User.objects.filter(is_staff=False).order_by('-date_joined')[:10]
     
     # Get messaging statistics (handle potential missing Message model)
     try:
-        total_messages = Message.objects.count()
+        total_messages = stats['total_messages']
         pending_messages = Message.objects.filter(status='pending').count()
         recent_messages = Message.objects.select_related('sender').order_by('-created_at')[:5]
     except:
@@ -190,11 +196,12 @@ def admin_dashboard(request):
         pending_messages = 0
         recent_messages = []
     
-    # Get student activities (handle potential missing StudentActivity model)
-    try:
-        recent_activities = StudentActivity.objects.select_related('user').order_by('-timestamp')[:10]
-    except:
-        recent_activities = []
+    # Get student activities; the 30-day summary spans raw rows and compacted rollups
+    recent_activities = StudentActivity.objects.select_related('student').order_by('-timestamp')[:10]
+    activity_summary = [
+        (activity_type.replace('_', ' ').title(), count)
+        for activity_type, count in activity_counts(timezone.localdate() - timedelta(days=29)).most_common()
+    ]
     
     context = {
         'total_questions': total_questions,
@@ -207,6 +214,7 @@ def admin_dashboard(request):
         'recent_users': recent_users,
         'recent_messages': recent_messages,
         'recent_activities': recent_activities,
+        'activity_summary': activity_summary,
     }
     
     return render(request, 'users/admin_dashboard.html', context)
@@ -525,7 +533,7 @@ def student_dashboard(request):
     
     # Get user's questions and answers
     from qna.models import Question, Answer
-    user_questions = Question.objects.filter(author=request.user).select_related('author').prefetch_related('answers').order_by('-created_at')[:5]
+    user_questions = Question.objects.filter(author=request.user).select_related('author').order_by('-created_at')[:5]
     user_answers = Answer.objects.filter(author=request.user).select_related('author', 'question').order_by('-created_at')[:5]
     
     context = {
@@ -538,16 +546,6 @@ def student_dashboard(request):
     
     return render(request, 'users/student_dashboard.html', context)
 
-# Initialize gamification system for new users
-def initialize_user_gamification(user):
-    """Initialize gamification data for new user"""
-    # Create StudentPoints if it doesn't exist
-    GamificationManager.get_or_create_points(user)
-    
-    # Create default achievements if they don't exist
-    from .gamification import create_default_achievements
-    create_default_achievements()
-
 # Settings Views
 @login_required
 def user_settings(request):
@@ -782,17 +780,26 @@ def gamification_dashboard(request):
 def leaderboard(request):
     """Full leaderboard view"""
     category = request.GET.get('category', 'total')
-    
-    # Get leaderboard
-    leaders = GamificationManager.get_leaderboard(limit=50, category=category)
-    
-    # Get user's rank
-    user_rank = GamificationManager.get_user_rank(request.user)
+    window = request.GET.get('window', 'all')
+    if window not in dict(LEADERBOARD_WINDOWS):
+        window = 'all'
+    
+    # Get leaderboard; time windows rank points earned in the window
+    if window == 'all':
+        leaders = GamificationManager.get_leaderboard(limit=50, category=category)
+        # The user's place on the same board (None for staff)
+        user_rank = Leaderboard.rank(request.user.id, category)
+    else:
+        category = 'total'
+        leaders = Leaderboard.top_window(window, limit=50)
+        user_rank = None
     
     context = {
         'leaders': leaders,
         'user_rank': user_rank,
         'current_category': category,
+        'current_window': window,
+        'windows': LEADERBOARD_WINDOWS,
         'categories': [
             ('total', 'Total Points'),
             ('questions', 'Questions Asked'),
@@ -804,6 +811,38 @@ def leaderboard(request):
     
     return render(request, 'users/leaderboard.html', context)
 
+@login_required
+def leaderboard_around_me(request):
+    """Leaderboard window centred on the current user, as JSON"""
+    category = request.GET.get('category', 'total')
+    try:
+        size = min(max(int(request.GET.get('n', 5)), 1), MAX_WINDOW)
+    except ValueError:
+        size = 5
+    
+    entry, above, below = Leaderboard.around(request.user.id, category, size)
+    if entry is None:
+        return JsonResponse({'success': False, 'error': 'Not ranked on this leaderboard'}, status=404)
+    
+    def serialize(leader):
+        return {
+            'username': leader.student.username,
+            'name': leader.student.first_name or leader.student.username,
+            'rank': leader.rank,
+            'score': leader.score,
+            'level': leader.level,
+            'is_me': leader.student_id == request.user.id,
+        }
+    
+    return JsonResponse({
+        'success': True,
+        'category': entry.category,
+        'rank': entry.rank,
+        'score': entry.score,
+        'percentile': round(Leaderboard.percentile(entry), 1),
+        'window': [serialize(leader) for leader in above + [entry] + below],
+    })
+
 @login_required
 @require_POST
 def mark_notification_read(request, notification_id):
@@ -823,6 +862,7 @@ def mark_all_notifications_read(request):
     (Notification.objects
         .filter(user=request.user, is_read=False)
         .update(is_read=True, read_at=timezone.now()))
+    invalidate_user_status(request.user.id)
     return JsonResponse({'success': True})
 
 
@@ -847,6 +887,7 @@ def notifications_list(request):
         is_read=True,
         read_at=timezone.now()
     )
+    invalidate_user_status(request.user.id)
     
     # Now get the limited set for display
     notifications = all_notifications[:20]